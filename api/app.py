@@ -11,7 +11,20 @@ import sys
 # Add parent directory to path to import OMRChecker modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from api.routes import api_blueprint
+from api.routes import api_blueprint, load_defaults  # noqa: E402
+from api.utils import ORJSONProvider, OMRRequest, DEFAULT_UPLOAD_SPOOL_SIZE  # noqa: E402
+from src.api_adapter import warmup  # noqa: E402
+
+
+def _warmup():
+    """
+    Prime OpenCV/numpy and the cached defaults before the first request
+
+    Under gunicorn (preload_app) this runs once in the master process,
+    so every forked worker starts warmed up
+    """
+    warmup()
+    load_defaults()
 
 
 def create_app(config=None):
@@ -25,11 +38,19 @@ def create_app(config=None):
         Flask application instance
     """
     app = Flask(__name__)
+    app.json = ORJSONProvider(app)
+    app.request_class = OMRRequest
 
     # Default configuration
     app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
+    # Non-file form fields (e.g. template/config JSON) kept in memory
+    app.config['MAX_FORM_MEMORY_SIZE'] = 2 * 1024 * 1024
+    # Uploaded files are spooled to disk above this size
+    app.config['UPLOAD_SPOOL_SIZE'] = DEFAULT_UPLOAD_SPOOL_SIZE
     app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(__file__), 'temp_uploads')
     app.config['JSON_SORT_KEYS'] = False
+    # Prime OpenCV and the default files at startup
+    app.config['WARMUP'] = True
 
     # Apply custom config if provided
     if config:
@@ -44,6 +65,9 @@ def create_app(config=None):
     # Register blueprints
     app.register_blueprint(api_blueprint, url_prefix='/api')
 
+    if app.config['WARMUP']:
+        _warmup()
+
     @app.route('/')
     def index():
         """Root endpoint with API information"""
@@ -53,6 +77,10 @@ def create_app(config=None):
             'endpoints': {
                 'POST /api/omr/process': 'Process single or multiple OMR images',
                 'POST /api/omr/batch': 'Batch process multiple images',
+                'POST /api/omr/jobs': 'Queue images for background processing',
+                'GET /api/omr/progress/<job_id>': 'Stream job progress (Server-Sent Events)',
+                'GET /api/omr/result/<job_id>': 'Get background job results',
+                'GET /api/omr/image/<token>': 'Download a processed image',
                 'POST /api/omr/validate-template': 'Validate template.json structure',
                 'GET /api/health': 'Health check endpoint'
             }
@@ -67,5 +95,7 @@ def create_app(config=None):
 
 
 if __name__ == '__main__':
+    # Development server only, use gunicorn in production:
+    #   gunicorn -c gunicorn.conf.py api.wsgi:application
     app = create_app()
-    app.run(host='0.0.0.0', port=8080, debug=True)
+    app.run(host='0.0.0.0', port=8080, debug=bool(os.environ.get('FLASK_DEV')))
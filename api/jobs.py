@@ -0,0 +1,239 @@
+"""
+Background job store for OMR Checker API
+Runs long OMR batches in daemon threads and exposes their progress
+
+Job state (status, progress events and result) is kept in files under
+JOBS_DIR, so the progress/result requests can be served by any gunicorn
+worker on the host, not only the one running the job.
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from uuid import uuid4
+
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+from api.utils import ORJSON_OPTIONS
+
+
+JOBS_DIR = os.path.join(tempfile.gettempdir(), 'omr_jobs')
+
+# Jobs are dropped this many seconds after their last progress update
+JOB_TTL_SECONDS = 60 * 60
+
+# Seconds between SSE heartbeats while waiting for progress
+HEARTBEAT_SECONDS = 15
+
+# Unfinished jobs without progress for this many seconds are failed, as the
+# worker running them was likely restarted (matches the gunicorn timeout)
+JOB_STALL_SECONDS = 120
+
+# Seconds between checks for new progress events
+PROGRESS_POLL_SECONDS = 0.25
+
+_JOB_ID_REGEX = re.compile(r'[0-9a-f]{32}')
+
+_STATUS_FILE = 'status.json'
+_EVENTS_FILE = 'events.ndjson'
+_RESULT_FILE = 'result.json'
+
+
+def submit_job(target, **kwargs):
+    """
+    Run target(progress_callback=..., **kwargs) in a background thread
+
+    Args:
+        target: Processing function accepting a progress_callback keyword
+        **kwargs: Arguments forwarded to target
+
+    Returns:
+        Job id (hex string)
+    """
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    _expire_jobs()
+
+    job_id = uuid4().hex
+    job_dir = os.path.join(JOBS_DIR, job_id)
+    os.makedirs(job_dir)
+    # Progress listeners read the events file from the start
+    open(os.path.join(job_dir, _EVENTS_FILE), 'wb').close()
+    _write_json(os.path.join(job_dir, _STATUS_FILE), {'status': 'pending'})
+
+    thread = threading.Thread(
+        target=_run_job,
+        args=(job_dir, target, kwargs),
+        daemon=True
+    )
+    thread.start()
+
+    return job_id
+
+
+def get_job(job_id):
+    """
+    Get job state
+
+    Args:
+        job_id: Id returned by submit_job
+
+    Returns:
+        Job dict with 'id', 'status' and (once finished) 'result' keys,
+        or None if unknown/expired
+    """
+    if not _JOB_ID_REGEX.fullmatch(job_id):
+        return None
+
+    job_dir = os.path.join(JOBS_DIR, job_id)
+    try:
+        status = _read_json(os.path.join(job_dir, _STATUS_FILE))['status']
+        if _fail_orphaned_job(job_dir, status):
+            status = 'error'
+        result = None
+        if status in ('done', 'error'):
+            result = _read_json(os.path.join(job_dir, _RESULT_FILE))
+    except OSError:
+        # Unknown, or expired (by another worker)
+        return None
+
+    return {'id': job_id, 'status': status, 'result': result}
+
+
+def iter_progress_events(job, heartbeat=HEARTBEAT_SECONDS):
+    """
+    Yield Server-Sent Events for a job until it finishes
+
+    Every listener gets all events of the job, from the start; the stream
+    ends with an error event if the job stops making progress (see
+    JOB_STALL_SECONDS)
+
+    Args:
+        job: Job dict from get_job
+        heartbeat: Seconds between heartbeat comments while idle
+
+    Yields:
+        SSE formatted strings
+    """
+    job_dir = os.path.join(JOBS_DIR, job['id'])
+    with open(os.path.join(job_dir, _EVENTS_FILE), 'rb') as f:
+        pending = b''
+        idle = 0.0
+        while True:
+            pending += f.readline()
+            if not pending.endswith(b'\n'):
+                # No (complete) new event yet
+                time.sleep(PROGRESS_POLL_SECONDS)
+                idle += PROGRESS_POLL_SECONDS
+                if idle >= heartbeat:
+                    idle = 0.0
+                    # Publishes the final error event of an orphaned job
+                    _fail_orphaned_job(job_dir)
+                    yield ': heartbeat\n\n'
+                continue
+
+            message = orjson.loads(pending)
+            pending = b''
+            idle = 0.0
+            yield _format_event(message)
+
+            if message['stage'] in ('done', 'error'):
+                return
+
+
+def _run_job(job_dir, target, kwargs):
+    """Execute the job and publish its progress and result to job_dir"""
+    _write_json(os.path.join(job_dir, _STATUS_FILE), {'status': 'running'})
+    _publish(job_dir, {'stage': 'started', 'pct': 0})
+
+    def progress_callback(processed, total, result):
+        _publish(job_dir, {
+            'stage': 'processing',
+            'pct': int(processed * 100 / total) if total else 100,
+            'processed': processed,
+            'total': total,
+            'file_name': result.get('file_name')
+        })
+
+    final_event = {'stage': 'done', 'pct': 100}
+    try:
+        result = target(progress_callback=progress_callback, **kwargs)
+        _write_json(os.path.join(job_dir, _RESULT_FILE), result)
+        status = 'done'
+    except Exception as e:
+        _write_json(os.path.join(job_dir, _RESULT_FILE), {'status': 'error', 'message': str(e)})
+        status = 'error'
+        final_event = {'stage': 'error', 'pct': 100, 'message': str(e)}
+
+    # The result is written before the status, so finished jobs always have one
+    _write_json(os.path.join(job_dir, _STATUS_FILE), {'status': status})
+    _publish(job_dir, final_event)
+
+
+def _fail_orphaned_job(job_dir, status=None):
+    """
+    Fail an unfinished job whose events weren't updated for JOB_STALL_SECONDS
+
+    Args:
+        job_dir: Directory of the job
+        status: Current job status (read from job_dir if not given)
+
+    Returns:
+        True if the job was failed
+    """
+    try:
+        if status is None:
+            status = _read_json(os.path.join(job_dir, _STATUS_FILE))['status']
+        last_update = os.stat(os.path.join(job_dir, _EVENTS_FILE)).st_mtime
+    except OSError:
+        return False
+    if status in ('done', 'error') or time.time() - last_update <= JOB_STALL_SECONDS:
+        return False
+
+    message = 'Job stopped - the worker processing it terminated unexpectedly'
+    _write_json(os.path.join(job_dir, _RESULT_FILE), {'status': 'error', 'message': message})
+    _write_json(os.path.join(job_dir, _STATUS_FILE), {'status': 'error'})
+    _publish(job_dir, {'stage': 'error', 'pct': 100, 'message': message})
+    return True
+
+
+def _publish(job_dir, message):
+    """Append a progress event to the job's events file"""
+    with open(os.path.join(job_dir, _EVENTS_FILE), 'ab') as f:
+        f.write(orjson.dumps(message) + b'\n')
+
+
+def _write_json(file_path, data):
+    """Write data as JSON, then rename, so readers never see a partial file"""
+    # (unique temp files, workers may fail an orphaned job concurrently)
+    temp_path = f'{file_path}.{uuid4().hex}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(orjson.dumps(data, default=DefaultJSONProvider.default, option=ORJSON_OPTIONS))
+    os.replace(temp_path, file_path)
+
+
+def _read_json(file_path):
+    """Read a JSON file written by _write_json"""
+    with open(file_path, 'rb') as f:
+        return orjson.loads(f.read())
+
+
+def _expire_jobs():
+    """Remove jobs without progress for JOB_TTL_SECONDS"""
+    now = time.time()
+    for entry in os.scandir(JOBS_DIR):
+        try:
+            last_update = os.stat(os.path.join(entry.path, _EVENTS_FILE)).st_mtime
+        except OSError:
+            # Already removed by another worker
+            continue
+        if now - last_update > JOB_TTL_SECONDS:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def _format_event(message):
+    """Format a message dict as an SSE data event"""
+    return f'data: {orjson.dumps(message).decode()}\n\n'
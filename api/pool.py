@@ -0,0 +1,124 @@
+"""
+Process pool for parallel OMR batch processing
+OMR processing is CPU-bound, so batch images are spread across processes
+"""
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+
+# Set OMR_API_PARALLEL_BATCH=0 to process batches sequentially
+PARALLEL_BATCH_ENABLED = os.environ.get('OMR_API_PARALLEL_BATCH', '1') != '0'
+
+# Number of pool processes (per gunicorn worker, gunicorn.conf.py divides
+# the cores between its workers), pools of 1 process are not used
+POOL_WORKERS = int(os.environ.get('OMR_API_POOL_WORKERS', os.cpu_count() or 1))
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    """
+    Import and warm up the OMR pipeline once per worker process
+
+    The pool already runs one image per core, so OpenCV and the BLAS
+    libraries are limited to a single thread per worker to avoid
+    oversubscribing the cores (like gunicorn workers, see post_fork in
+    gunicorn.conf.py; only the development server keeps OpenCV's own
+    threading for images processed outside the pool)
+    """
+    # Only effective for libraries not loaded yet (e.g. spawned workers)
+    for thread_env in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[thread_env] = '1'
+
+    import cv2
+    cv2.setNumThreads(1)
+
+    from src.api_adapter import warmup
+    warmup()
+
+
+def get_pool():
+    """
+    Get the process pool of the current process
+
+    The pool is created lazily (and re-created after a fork, e.g. in
+    gunicorn workers) since executors can't be shared across processes.
+
+    Returns:
+        ProcessPoolExecutor instance
+    """
+    global _pool, _pool_pid
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(
+                max_workers=POOL_WORKERS,
+                initializer=_init_worker
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def should_parallelize(image_count):
+    """
+    Check whether a batch should be processed in the pool
+
+    Args:
+        image_count: Number of images in the batch
+
+    Returns:
+        Boolean indicating if the batch should be parallelized
+    """
+    return PARALLEL_BATCH_ENABLED and POOL_WORKERS > 1 and image_count >= 2
+
+
+def iter_completed(fn, tasks):
+    """
+    Run fn(task) for each task in the process pool
+
+    Args:
+        fn: Picklable module-level function
+        tasks: List of picklable task arguments
+
+    Yields:
+        Tuples (task index, result) in order of completion
+
+    Raises:
+        BrokenProcessPool: After yielding the completed tasks, if a pool
+            process died (e.g. killed for running out of memory); the next
+            call gets a new pool
+    """
+    pool = get_pool()
+    try:
+        futures = {pool.submit(fn, task): index for index, task in enumerate(tasks)}
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+
+    broken = None
+    for future in as_completed(futures):
+        try:
+            result = future.result()
+        except BrokenProcessPool as e:
+            broken = e
+            continue
+        yield futures[future], result
+
+    if broken is not None:
+        _discard_pool(pool)
+        raise broken
+
+
+def _discard_pool(pool):
+    """Drop a broken pool, so get_pool creates a new one"""
+    global _pool
+
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
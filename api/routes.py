@@ -3,27 +3,99 @@ API Routes for OMR Checker
 Defines all REST API endpoints
 """
 
-from flask import Blueprint, request, jsonify, send_file
-from werkzeug.utils import secure_filename
+from flask import Blueprint, Response, request, jsonify, send_file, stream_with_context
 import os
-import json
+import hmac
 import time
-from io import BytesIO
-import base64
+import functools
+import orjson
 
 from api.utils import (
     allowed_file,
-    save_uploaded_file,
-    validate_template_json,
-    validate_config_json,
-    cleanup_temp_files,
-    create_csv_response
+    validate_template_json_cached,
+    validate_config_json_cached,
+    PREVIEW_MIMETYPES,
+    PREVIEW_MAX_AGE_SECONDS,
+    DEFAULT_PREVIEW_FORMAT,
+    get_preview,
+    result_cache_key,
+    get_cached_result,
+    cache_result,
+    clear_caches,
+    create_csv_response,
+    create_json_response,
+    create_ndjson_response
 )
-from src.api_adapter import process_omr_image, process_omr_batch, process_dir_for_api
+from api.jobs import submit_job, get_job, iter_progress_events
+from src.api_adapter import (
+    process_omr_image,
+    process_omr_batch,
+    process_omr_batch_iter,
+    process_dir_for_api
+)
+from src.utils.parsing import open_config_with_defaults
 
 
 api_blueprint = Blueprint('api', __name__)
 
+DEFAULTS_DIR = os.path.join(os.path.dirname(__file__), 'defaults')
+
+
+def _default_file_key(file_name):
+    """Cache key (path, mtime) of a file in api/defaults (None if missing)"""
+    file_path = os.path.join(DEFAULTS_DIR, file_name)
+    try:
+        return file_path, os.stat(file_path).st_mtime_ns
+    except OSError:
+        return None
+
+
+# The default files are cached until they are modified, so edits are picked
+# up by every worker without a restart
+@functools.lru_cache(maxsize=2)
+def _read_default_file(file_path, mtime_ns):
+    """Raw bytes of a file in api/defaults"""
+    with open(file_path, 'rb') as f:
+        return f.read()
+
+
+@functools.lru_cache(maxsize=1)
+def _parse_default_template(file_path, mtime_ns):
+    """Raw and parsed default template"""
+    template_bytes = _read_default_file(file_path, mtime_ns)
+    return template_bytes, orjson.loads(template_bytes)
+
+
+@functools.lru_cache(maxsize=1)
+def _load_default_config(file_path, mtime_ns):
+    """Default config merged with CONFIG_DEFAULTS"""
+    return open_config_with_defaults(file_path).toDict()
+
+
+def _default_template():
+    """Raw and parsed default template from api/defaults (None if missing)"""
+    key = _default_file_key('template.json')
+    return None if key is None else _parse_default_template(*key)
+
+
+def _default_config():
+    """Default config from api/defaults merged with CONFIG_DEFAULTS (None if missing)"""
+    key = _default_file_key('config.json')
+    return None if key is None else _load_default_config(*key)
+
+
+def _default_marker_bytes():
+    """Raw bytes of the default marker image from api/defaults (None if missing)"""
+    key = _default_file_key('omr_marker.jpg')
+    return None if key is None else _read_default_file(*key)
+
+
+def load_defaults():
+    """Read the default template/config/marker from api/defaults into their caches"""
+    _default_template()
+    _default_config()
+    _default_marker_bytes()
+
 
 @api_blueprint.route('/omr/process', methods=['POST'])
 def process_omr():
@@ -41,17 +113,26 @@ def process_omr():
 
     Returns:
         - JSON response with detected answers
-        - Optional: processed images as base64
+        - Optional: processed images as URLs or base64
         - Optional: CSV download
+        - Optional: NDJSON stream of per-image results (uploads only)
     """
     start_time = time.time()
-    temp_files = []
 
     try:
+        output_format = request.args.get('format') or request.form.get('format')
+
         # Check if request is file upload or directory path
         if request.content_type and 'multipart/form-data' in request.content_type:
             # File upload mode
-            result = _process_file_upload(request, temp_files)
+            if output_format == 'ndjson':
+                # Stream one JSON line per image as it is processed
+                inputs = _read_upload_inputs(request)
+                # Upload streams are closed once the view returns, read them now
+                inputs['images_data'] = [stream.read() for stream in inputs['images_data']]
+                return create_ndjson_response(process_omr_batch_iter(**inputs), start_time)
+
+            result = _process_file_upload(request)
         elif request.is_json:
             # Directory path mode
             result = _process_directory_path(request)
@@ -65,10 +146,10 @@ def process_omr():
         result['processing_time'] = round(time.time() - start_time, 2)
 
         # Handle CSV download if requested
-        if request.args.get('format') == 'csv' or request.form.get('format') == 'csv':
+        if output_format == 'csv':
             return create_csv_response(result)
 
-        return jsonify(result), 200
+        return create_json_response(result)
 
     except Exception as e:
         return jsonify({
@@ -77,129 +158,190 @@ def process_omr():
             'processing_time': round(time.time() - start_time, 2)
         }), 500
 
-    finally:
-        # Cleanup temporary files
-        cleanup_temp_files(temp_files)
 
-
-def _process_file_upload(request, temp_files):
+def _process_file_upload(request):
     """Handle file upload processing"""
+    inputs = _read_upload_inputs(request)
+
+    # Process single or multiple images
+    if len(inputs['images_data']) == 1:
+        # Single image processing
+        result = _process_single_image(inputs)
+    else:
+        # Multiple images processing (spread across the process pool)
+        result = process_omr_batch(**inputs)
+
+    return result
+
+
+def _process_single_image(inputs):
+    """
+    Process a single uploaded image
+
+    Results without processed images are cached, so repeated requests with
+    the same image, template, config and marker skip processing
+    """
+    image_data = inputs['images_data'][0]
+    file_name = inputs['file_names'][0]
+
+    cache_key = None
+    if not inputs['include_images']:
+        image_data = image_data.read()
+        cache_key = result_cache_key(
+            image_data,
+            inputs['template_data'],
+            inputs['config_data'],
+            inputs['marker_data'],
+            inputs['auto_align']
+        )
+        result = get_cached_result(cache_key)
+        if result is not None:
+            result['file_name'] = file_name
+            return result
+
+    result = process_omr_image(
+        image_data=image_data,
+        template_data=inputs['template_data'],
+        config_data=inputs['config_data'],
+        marker_data=inputs['marker_data'],
+        file_name=file_name,
+        include_image=inputs['include_images'],
+        auto_align=inputs['auto_align'],
+        image_format=inputs['image_format'],
+        image_delivery=inputs['image_delivery']
+    )
+
+    if cache_key is not None and result['status'] == 'success':
+        cache_result(cache_key, result)
+
+    return result
+
+
+def _read_upload_inputs(request):
+    """
+    Read and validate the multipart inputs of a processing request
+
+    Returns:
+        Dictionary of keyword arguments for process_omr_batch,
+        with images_data holding the upload streams
+    """
+    # Read the request fields once
+    args = request.args
+    form = request.form
+    files = request.files
+
     # Validate required files
-    if 'image' not in request.files:
+    image_files = files.getlist('image')
+    if not image_files:
         raise ValueError('No image file provided')
 
     # Get uploaded files
-    image_files = request.files.getlist('image')
-    template_file = request.files.get('template')
-    config_file = request.files.get('config')
-    marker_file = request.files.get('marker')
+    template_file = files.get('template')
+    config_file = files.get('config')
+    marker_file = files.get('marker')
+    template_str = form.get('template')
+    config_str = form.get('config')
 
     # Validate image files
-    for img in image_files:
-        if not allowed_file(img.filename, ['png', 'jpg', 'jpeg']):
-            raise ValueError(f'Invalid image file: {img.filename}')
+    invalid_file_name = next(
+        (img.filename for img in image_files if not allowed_file(img.filename)),
+        None
+    )
+    if invalid_file_name is not None:
+        raise ValueError(f'Invalid image file: {invalid_file_name}')
 
     # Get template from file or form field, or use default
+    # (raw JSON is kept to reuse validation results of identical templates)
     if template_file:
-        template_data = json.load(template_file)
-    elif 'template' in request.form:
-        template_data = json.loads(request.form['template'])
+        template_bytes = template_file.read()
+        template_data = orjson.loads(template_bytes)
+    elif template_str is not None:
+        template_bytes = template_str
+        template_data = orjson.loads(template_bytes)
     else:
         # Use default template from api/defaults folder
-        default_template_path = os.path.join(
-            os.path.dirname(__file__),
-            'defaults',
-            'template.json'
-        )
-        if os.path.exists(default_template_path):
-            with open(default_template_path, 'r') as f:
-                template_data = json.load(f)
-        else:
+        # (shared between requests, processing doesn't modify it)
+        default_template = _default_template()
+        if default_template is None:
             raise ValueError('No template provided and default template not found')
+        template_bytes, template_data = default_template
 
     # Validate template
-    validate_template_json(template_data)
+    validate_template_json_cached(template_bytes, template_data)
 
     # Get config from file or form field, or use default
     config_data = None
+    config_bytes = None
     if config_file:
-        config_data = json.load(config_file)
-    elif 'config' in request.form:
-        config_data = json.loads(request.form['config'])
+        config_bytes = config_file.read()
+        config_data = orjson.loads(config_bytes)
+    elif config_str is not None:
+        config_bytes = config_str
+        config_data = orjson.loads(config_bytes)
     else:
         # Use default config from api/defaults folder
-        default_config_path = os.path.join(
-            os.path.dirname(__file__),
-            'defaults',
-            'config.json'
-        )
-        if os.path.exists(default_config_path):
-            from src.utils.parsing import open_config_with_defaults
-            config_data = open_config_with_defaults(default_config_path)
+        config_data = _default_config()
 
     if config_data:
-        validate_config_json(config_data)
+        validate_config_json_cached(config_bytes, config_data)
 
     # Get marker image data if provided, or use default
     marker_data = None
     if marker_file:
         marker_data = marker_file.read()
-        temp_files.append(marker_data)
     else:
         # Use default marker from api/defaults folder if template uses CropOnMarkers
         if 'preProcessors' in template_data:
             for processor in template_data['preProcessors']:
                 if processor.get('name') == 'CropOnMarkers':
-                    default_marker_path = os.path.join(
-                        os.path.dirname(__file__),
-                        'defaults',
-                        'omr_marker.jpg'
-                    )
-                    if os.path.exists(default_marker_path):
-                        with open(default_marker_path, 'rb') as f:
-                            marker_data = f.read()
+                    marker_data = _default_marker_bytes()
                     break
 
     # Get options
-    include_image = request.form.get('include_image', 'false').lower() == 'true'
-    auto_align = request.form.get('auto_align', 'false').lower() == 'true'
+    include_image = form.get('include_image', 'false').lower() == 'true'
+    auto_align = form.get('auto_align', 'false').lower() == 'true'
+    image_format = _get_preview_format(
+        args.get('preview_format') or form.get('preview_format')
+    )
+    image_delivery = _get_image_delivery(
+        args.get('image_delivery') or form.get('image_delivery')
+    )
 
-    # Process single or multiple images
-    if len(image_files) == 1:
-        # Single image processing
-        image_data = image_files[0].read()
-        temp_files.append(image_data)
-
-        result = process_omr_image(
-            image_data=image_data,
-            template_data=template_data,
-            config_data=config_data,
-            marker_data=marker_data,
-            file_name=image_files[0].filename,
-            include_image=include_image,
-            auto_align=auto_align
-        )
-    else:
-        # Multiple images processing
-        images_data = []
-        file_names = []
-        for img_file in image_files:
-            img_data = img_file.read()
-            images_data.append(img_data)
-            file_names.append(img_file.filename)
-            temp_files.append(img_data)
-
-        result = process_omr_batch(
-            images_data=images_data,
-            file_names=file_names,
-            template_data=template_data,
-            config_data=config_data,
-            marker_data=marker_data,
-            include_images=include_image,
-            auto_align=auto_align
+    # Images are handed over as their upload streams, so each one is only
+    # read into memory when it is decoded
+    return {
+        'images_data': [img_file.stream for img_file in image_files],
+        'file_names': [img_file.filename for img_file in image_files],
+        'template_data': template_data,
+        'config_data': config_data,
+        'marker_data': marker_data,
+        'include_images': include_image,
+        'auto_align': auto_align,
+        'image_format': image_format,
+        'image_delivery': image_delivery
+    }
+
+
+def _get_preview_format(preview_format):
+    """Validate the requested processed image format (default: jpg)"""
+    preview_format = (preview_format or DEFAULT_PREVIEW_FORMAT).lower()
+    if preview_format == 'jpeg':
+        preview_format = 'jpg'
+    if preview_format not in PREVIEW_MIMETYPES:
+        raise ValueError(
+            f'Invalid preview_format: {preview_format}. Use one of {sorted(PREVIEW_MIMETYPES)}'
         )
+    return preview_format
 
-    return result
+
+def _get_image_delivery(image_delivery):
+    """Validate how processed images are returned (default: url)"""
+    image_delivery = (image_delivery or 'url').lower()
+    if image_delivery not in ('url', 'base64'):
+        raise ValueError(
+            f"Invalid image_delivery: {image_delivery}. Use one of ['base64', 'url']"
+        )
+    return image_delivery
 
 
 def _process_directory_path(request):
@@ -218,12 +360,20 @@ def _process_directory_path(request):
     # Get options
     include_image = data.get('include_image', False)
     auto_align = data.get('auto_align', False)
+    image_format = _get_preview_format(
+        request.args.get('preview_format') or data.get('preview_format')
+    )
+    image_delivery = _get_image_delivery(
+        request.args.get('image_delivery') or data.get('image_delivery')
+    )
 
     # Process directory
     result = process_dir_for_api(
         input_dir=directory,
         include_images=include_image,
-        auto_align=auto_align
+        auto_align=auto_align,
+        image_format=image_format,
+        image_delivery=image_delivery
     )
 
     return result
@@ -242,6 +392,117 @@ def batch_process():
     return process_omr()
 
 
+@api_blueprint.route('/omr/jobs', methods=['POST'])
+def create_job():
+    """
+    Queue OMR images for background processing
+
+    Accepts the same multipart/form-data fields as /omr/process
+
+    Returns:
+        - 202 with job_id; follow progress at /omr/progress/<job_id>
+          and fetch the output from /omr/result/<job_id>
+    """
+    try:
+        if not (request.content_type and 'multipart/form-data' in request.content_type):
+            return jsonify({
+                'status': 'error',
+                'message': 'Invalid request format. Use multipart/form-data for file uploads.'
+            }), 400
+
+        inputs = _read_upload_inputs(request)
+        # Upload streams are closed when the request ends, read them now
+        inputs['images_data'] = [stream.read() for stream in inputs['images_data']]
+        job_id = submit_job(process_omr_batch, **inputs)
+
+        return jsonify({
+            'status': 'queued',
+            'job_id': job_id,
+            'progress_url': f'/api/omr/progress/{job_id}',
+            'result_url': f'/api/omr/result/{job_id}'
+        }), 202
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+
+@api_blueprint.route('/omr/progress/<job_id>', methods=['GET'])
+def job_progress(job_id):
+    """
+    Stream job progress as Server-Sent Events
+
+    Each event is a JSON object with 'stage' and 'pct' keys;
+    the stream ends with a 'done' or 'error' stage
+    """
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({
+            'status': 'error',
+            'message': f'Job not found: {job_id}'
+        }), 404
+
+    return Response(
+        stream_with_context(iter_progress_events(job)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache'}
+    )
+
+
+@api_blueprint.route('/omr/result/<job_id>', methods=['GET'])
+def job_result(job_id):
+    """
+    Get the result of a background job
+
+    Returns:
+        - 202 while the job is still running
+        - JSON (or CSV with ?format=csv) batch results once finished
+    """
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({
+            'status': 'error',
+            'message': f'Job not found: {job_id}'
+        }), 404
+
+    if job['status'] in ('pending', 'running'):
+        return jsonify({
+            'status': job['status'],
+            'job_id': job_id
+        }), 202
+
+    if job['status'] == 'error':
+        return jsonify(job['result']), 500
+
+    if request.args.get('format') == 'csv':
+        return create_csv_response(job['result'])
+
+    return create_json_response(job['result'])
+
+
+@api_blueprint.route('/omr/image/<token>', methods=['GET'])
+def processed_image(token):
+    """
+    Download a processed image returned as processed_image_url
+
+    Images expire a few minutes after processing
+    """
+    preview = get_preview(token)
+    if preview is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'Image not found or expired'
+        }), 404
+
+    file_path, mimetype = preview
+    response = send_file(file_path, mimetype=mimetype)
+    response.headers['Cache-Control'] = f'private, max-age={PREVIEW_MAX_AGE_SECONDS}'
+
+    return response
+
+
 @api_blueprint.route('/omr/validate-template', methods=['POST'])
 def validate_template():
     """
@@ -257,10 +518,11 @@ def validate_template():
     try:
         # Get template from request
         if request.is_json:
+            template_bytes = request.get_data()
             template_data = request.get_json()
         elif 'template' in request.files:
-            template_file = request.files['template']
-            template_data = json.load(template_file)
+            template_bytes = request.files['template'].read()
+            template_data = orjson.loads(template_bytes)
         else:
             return jsonify({
                 'status': 'error',
@@ -268,7 +530,11 @@ def validate_template():
             }), 400
 
         # Validate template
-        validation_result = validate_template_json(template_data, return_details=True)
+        validation_result = validate_template_json_cached(
+            template_bytes,
+            template_data,
+            return_details=True
+        )
 
         return jsonify({
             'status': 'success',
@@ -284,6 +550,36 @@ def validate_template():
         }), 500
 
 
+@api_blueprint.route('/admin/cache/clear', methods=['POST'])
+def clear_cache():
+    """
+    Drop cached processing and validation results of the worker process
+    serving the request (results are cached per process)
+
+    Only available when OMR_API_ADMIN_TOKEN is set, the token must be sent
+    in the X-Admin-Token header
+    """
+    admin_token = os.environ.get('OMR_API_ADMIN_TOKEN')
+    if not admin_token:
+        return jsonify({
+            'status': 'error',
+            'message': 'Not found'
+        }), 404
+
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token):
+        return jsonify({
+            'status': 'error',
+            'message': 'Invalid admin token'
+        }), 403
+
+    clear_caches()
+
+    return jsonify({
+        'status': 'success',
+        'message': f'Cache cleared in worker process {os.getpid()}'
+    }), 200
+
+
 @api_blueprint.errorhandler(413)
 def request_entity_too_large(error):
     """Handle file too large error"""
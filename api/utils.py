@@ -3,19 +3,148 @@ Utility functions for Flask API
 """
 
 import os
-import json
+import copy
+import csv
+import math
+import functools
 import base64
-from io import BytesIO, StringIO
+import re
+import time
+import hashlib
+import tempfile
+import threading
+from uuid import uuid4
+from collections import OrderedDict
+from io import StringIO
 from werkzeug.utils import secure_filename
-from flask import send_file
-import pandas as pd
+from flask import Request, Response, current_app, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.formparser import FormDataParser, MultiPartParser
+import orjson
 import cv2
 import numpy as np
+from dotmap import DotMap
+
+from src.defaults import TEMPLATE_DEFAULTS
+from src.schemas import SCHEMA_VALIDATORS
 
 
 ALLOWED_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 ALLOWED_JSON_EXTENSIONS = {'json'}
 
+_ALLOWED_IMAGE_SUFFIXES = tuple(f'.{ext}' for ext in sorted(ALLOWED_IMAGE_EXTENSIONS))
+
+# Formats available for returned processed images
+PREVIEW_MIMETYPES = {'jpg': 'image/jpeg', 'png': 'image/png'}
+DEFAULT_PREVIEW_FORMAT = 'jpg'
+DEFAULT_JPEG_QUALITY = 85
+
+# Processed images served by /api/omr/image/<token> instead of inlined as base64
+# (kept on disk so they are reachable from every worker process)
+PREVIEW_DIR = os.path.join(tempfile.gettempdir(), 'omr_previews')
+PREVIEW_URL_PREFIX = '/api/omr/image/'
+PREVIEW_TTL_SECONDS = 10 * 60
+PREVIEW_MAX_AGE_SECONDS = 5 * 60
+_PREVIEW_TOKEN_REGEX = re.compile(r'[0-9a-f]{32}')
+_last_preview_cleanup = 0
+
+# cv2.imdecode flags for each supported decode downscale factor
+REDUCED_GRAYSCALE_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+# Largest decode downscale factor (1 decodes at full resolution)
+MAX_DECODE_SCALE = 8
+
+# JPEG start-of-frame markers (which hold the image dimensions)
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+TEMPLATE_VALIDATOR = SCHEMA_VALIDATORS['template']
+
+# Validation results are cached by content hash of the raw JSON
+VALIDATION_CACHE_SIZE = 64
+
+_template_validation_cache = OrderedDict()
+_config_validation_cache = OrderedDict()
+_validation_cache_lock = threading.Lock()
+
+# Processing results (without images) are cached by content hash of the inputs
+RESULT_CACHE_SIZE = 256
+
+_result_cache = OrderedDict()
+_result_cache_lock = threading.Lock()
+
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson
+
+    Serializes numpy arrays/scalars natively and falls back to Flask's
+    default handling for other types (dates, decimals, dataclasses, ...)
+    """
+
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        option = ORJSON_OPTIONS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+# Multipart parser read size (Werkzeug default: 64KB)
+UPLOAD_BUFFER_SIZE = 256 * 1024
+
+# Uploaded files up to this size stay in memory (Werkzeug default: 500KB),
+# override with the UPLOAD_SPOOL_SIZE app config
+DEFAULT_UPLOAD_SPOOL_SIZE = 4 * 1024 * 1024
+
+
+class OMRFormDataParser(FormDataParser):
+    """Form data parser reading multipart uploads in larger chunks"""
+
+    def _parse_multipart(self, stream, mimetype, content_length, options):
+        parser = MultiPartParser(
+            stream_factory=self.stream_factory,
+            max_form_memory_size=self.max_form_memory_size,
+            max_form_parts=self.max_form_parts,
+            cls=self.cls,
+            buffer_size=UPLOAD_BUFFER_SIZE
+        )
+        boundary = options.get('boundary', '').encode('ascii')
+
+        if not boundary:
+            raise ValueError('Missing boundary')
+
+        form, files = parser.parse(stream, boundary, content_length)
+        return stream, form, files
+
+
+class OMRRequest(Request):
+    """
+    Flask request tuned for uploads of OMR images
+
+    Typical scans fit the in-memory spool, so they are decoded without a
+    round trip through a temporary file
+    """
+
+    form_data_parser_class = OMRFormDataParser
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        max_size = current_app.config.get('UPLOAD_SPOOL_SIZE', DEFAULT_UPLOAD_SPOOL_SIZE)
+        return tempfile.SpooledTemporaryFile(max_size=max_size, mode='rb+')
+
 
 def allowed_file(filename, extensions=None):
     """
@@ -23,16 +152,18 @@ def allowed_file(filename, extensions=None):
 
     Args:
         filename: Name of the file
-        extensions: Set of allowed extensions (default: ALLOWED_IMAGE_EXTENSIONS)
+        extensions: Iterable of allowed lowercase extensions, e.g. {'json'}
+            (default: ALLOWED_IMAGE_EXTENSIONS)
 
     Returns:
         Boolean indicating if file is allowed
     """
     if extensions is None:
-        extensions = ALLOWED_IMAGE_EXTENSIONS
+        suffixes = _ALLOWED_IMAGE_SUFFIXES
+    else:
+        suffixes = tuple(f'.{ext}' for ext in extensions)
 
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in extensions
+    return filename.lower().endswith(suffixes)
 
 
 def save_uploaded_file(file, upload_folder):
@@ -52,22 +183,6 @@ def save_uploaded_file(file, upload_folder):
     return filepath
 
 
-def cleanup_temp_files(temp_files):
-    """
-    Clean up temporary files
-
-    Args:
-        temp_files: List of file paths to delete
-    """
-    for filepath in temp_files:
-        try:
-            if isinstance(filepath, str) and os.path.exists(filepath):
-                os.remove(filepath)
-        except Exception as e:
-            # Silent fail for cleanup
-            pass
-
-
 def validate_template_json(template_data, return_details=False):
     """
     Validate template JSON structure
@@ -79,62 +194,25 @@ def validate_template_json(template_data, return_details=False):
     Returns:
         Boolean (if return_details=False) or dict with validation results
     """
-    from src.utils.validations import validate_template_json as core_validate
-    import jsonschema
-
-    errors = []
-    warnings = []
-
-    try:
-        # Use the built-in validator
-        core_validate(template_data, "api_template_validation")
-        is_valid = True
-    except Exception as e:
-        is_valid = False
-        errors.append(str(e))
-
-        # Additional checks
-        if 'pageDimensions' not in template_data:
-            errors.append("Missing 'pageDimensions'")
-
-        if 'bubbleDimensions' not in template_data:
-            errors.append("Missing 'bubbleDimensions'")
-
-        if 'fieldBlocks' not in template_data or not template_data['fieldBlocks']:
-            errors.append("Missing or empty 'fieldBlocks'")
-
-        # Check field blocks
-        if 'fieldBlocks' in template_data:
-            for block_name, block_config in template_data['fieldBlocks'].items():
-                # Either fieldType OR (bubbleValues + direction) is required
-                has_field_type = 'fieldType' in block_config
-                has_custom_values = 'bubbleValues' in block_config and 'direction' in block_config
-                if not has_field_type and not has_custom_values:
-                    errors.append(f"Block '{block_name}' missing 'fieldType' or 'bubbleValues'+'direction'")
-
-                if 'origin' not in block_config:
-                    errors.append(f"Block '{block_name}' missing 'origin'")
-
-                if 'fieldLabels' not in block_config:
-                    warnings.append(f"Block '{block_name}' missing 'fieldLabels'")
-
-        if return_details:
-            return {
-                'valid': len(errors) == 0,
-                'errors': errors,
-                'warnings': warnings
-            }
-
-        return len(errors) == 0
-
-    except Exception as e:
-        if return_details:
-            return {
-                'valid': False,
-                'errors': [str(e)],
-                'warnings': []
-            }
-        return False
+    # Validate with template defaults applied, as Template.from_dict does
+    template_data = {**TEMPLATE_DEFAULTS, **template_data}
+
+    # Use the precompiled template schema validator
+    errors = [
+        f"{'.'.join(str(key) for key in error.path) or '$root'}: {error.message}"
+        for error in sorted(
+            TEMPLATE_VALIDATOR.iter_errors(template_data),
+            key=lambda e: list(map(str, e.path))
+        )
+    ]
+
+    if return_details:
+        return {
+            'valid': len(errors) == 0,
+            'errors': errors,
+            'warnings': []
+        }
+    return len(errors) == 0
 
 
 def validate_config_json(config_data):
@@ -152,32 +230,235 @@ def validate_config_json(config_data):
         if not isinstance(config_data, dict):
             return False
 
-        # Check for known keys (optional)
-        known_keys = ['dimensions', 'threshold_params', 'outputs', 'alignment_params']
-
         return True
 
     except Exception:
         return False
 
 
-def numpy_to_base64(image_array):
+def validate_template_json_cached(raw_bytes, template_data, return_details=False):
+    """
+    Validate template JSON, reusing the result for identical content
+
+    Args:
+        raw_bytes: Raw template JSON bytes (used as cache key), None to skip caching
+        template_data: Parsed template dictionary
+        return_details: If True, return detailed validation results
+
+    Returns:
+        Same as validate_template_json
+    """
+    return _cached_validation(
+        _template_validation_cache,
+        raw_bytes,
+        return_details,
+        lambda: validate_template_json(template_data, return_details=return_details)
+    )
+
+
+def validate_config_json_cached(raw_bytes, config_data):
+    """
+    Validate config JSON, reusing the result for identical content
+
+    Args:
+        raw_bytes: Raw config JSON bytes (used as cache key), None to skip caching
+        config_data: Parsed config dictionary
+
+    Returns:
+        Same as validate_config_json
+    """
+    return _cached_validation(
+        _config_validation_cache,
+        raw_bytes,
+        False,
+        lambda: validate_config_json(config_data)
+    )
+
+
+def _cached_validation(cache, raw_bytes, return_details, validate):
+    """Look up a validation result by content hash, running validate() on a miss"""
+    if raw_bytes is None:
+        return validate()
+
+    if isinstance(raw_bytes, str):
+        raw_bytes = raw_bytes.encode('utf-8')
+    key = (hashlib.blake2b(raw_bytes, digest_size=16).hexdigest(), return_details)
+
+    with _validation_cache_lock:
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+
+    result = validate()
+
+    with _validation_cache_lock:
+        cache[key] = result
+        if len(cache) > VALIDATION_CACHE_SIZE:
+            cache.popitem(last=False)
+
+    return result
+
+
+def result_cache_key(image_bytes, template_data, config_data=None, marker_data=None, auto_align=False):
+    """
+    Compute the result cache key of a processing request
+
+    Args:
+        image_bytes: Raw image bytes
+        template_data: Parsed template dictionary
+        config_data: Parsed config dictionary (optional)
+        marker_data: Raw marker image bytes (optional)
+        auto_align: Whether automatic alignment is enabled
+
+    Returns:
+        Hex digest identifying the request inputs
+    """
+    canonical_option = ORJSON_OPTIONS | orjson.OPT_SORT_KEYS
+    # orjson serializes a DotMap (e.g. from open_config_with_defaults) as {}
+    if isinstance(config_data, DotMap):
+        config_data = config_data.toDict()
+    hasher = hashlib.blake2b(digest_size=16)
+    for part in (
+        image_bytes,
+        orjson.dumps(template_data, option=canonical_option),
+        orjson.dumps(config_data or {}, option=canonical_option),
+        marker_data or b'',
+        b'1' if auto_align else b'0'
+    ):
+        hasher.update(len(part).to_bytes(8, 'little'))
+        hasher.update(part)
+    return hasher.hexdigest()
+
+
+def get_cached_result(key):
+    """
+    Look up a cached processing result
+
+    Args:
+        key: Key from result_cache_key
+
+    Returns:
+        Copy of the cached result, or None on a miss
+    """
+    with _result_cache_lock:
+        if key not in _result_cache:
+            return None
+        _result_cache.move_to_end(key)
+        return copy.deepcopy(_result_cache[key])
+
+
+def cache_result(key, result):
+    """
+    Store a processing result
+
+    Args:
+        key: Key from result_cache_key
+        result: Result dictionary (copied, callers may keep modifying it)
+    """
+    result = copy.deepcopy(result)
+    with _result_cache_lock:
+        _result_cache[key] = result
+        _result_cache.move_to_end(key)
+        if len(_result_cache) > RESULT_CACHE_SIZE:
+            _result_cache.popitem(last=False)
+
+
+def clear_caches():
+    """Drop all cached processing and validation results"""
+    with _result_cache_lock:
+        _result_cache.clear()
+    with _validation_cache_lock:
+        _template_validation_cache.clear()
+        _config_validation_cache.clear()
+
+
+def numpy_to_base64(image_array, fmt=DEFAULT_PREVIEW_FORMAT, quality=DEFAULT_JPEG_QUALITY):
     """
     Convert numpy array image to base64 string
 
     Args:
         image_array: Numpy array representing image
+        fmt: Image format, 'jpg' (default) or 'png'
+        quality: JPEG quality (0-100), ignored for PNG
 
     Returns:
         Base64 encoded string
     """
-    # Encode image to PNG format
-    _, buffer = cv2.imencode('.png', image_array)
+    # JPEG is much faster to encode and smaller than PNG for scanned sheets
+    params = [cv2.IMWRITE_JPEG_QUALITY, quality] if fmt == 'jpg' else []
+    _, buffer = cv2.imencode(f'.{fmt}', image_array, params)
+
+    # Convert to base64, reading the encoded buffer in place
+    # (no intermediate bytes copy)
+    return base64.b64encode(memoryview(buffer)).decode('ascii')
+
+
+def store_preview(image_array, fmt=DEFAULT_PREVIEW_FORMAT, quality=DEFAULT_JPEG_QUALITY):
+    """
+    Encode an image and store it for download via PREVIEW_URL_PREFIX
+
+    Args:
+        image_array: Numpy array representing image
+        fmt: Image format, 'jpg' (default) or 'png'
+        quality: JPEG quality (0-100), ignored for PNG
+
+    Returns:
+        URL path of the stored image
+    """
+    params = [cv2.IMWRITE_JPEG_QUALITY, quality] if fmt == 'jpg' else []
+    _, buffer = cv2.imencode(f'.{fmt}', image_array, params)
+
+    os.makedirs(PREVIEW_DIR, exist_ok=True)
+    _cleanup_previews()
+
+    token = uuid4().hex
+    file_path = os.path.join(PREVIEW_DIR, f'{token}.{fmt}')
+    # Write then rename, so readers never see a partial file
+    temp_path = f'{file_path}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(buffer)
+    os.replace(temp_path, file_path)
+
+    return f'{PREVIEW_URL_PREFIX}{token}'
+
+
+def get_preview(token):
+    """
+    Find a stored processed image
+
+    Args:
+        token: Token from the URL returned by store_preview
+
+    Returns:
+        Tuple (file path, mimetype), or None if unknown/expired
+    """
+    if not _PREVIEW_TOKEN_REGEX.fullmatch(token):
+        return None
 
-    # Convert to base64
-    base64_str = base64.b64encode(buffer).decode('utf-8')
+    for fmt, mimetype in PREVIEW_MIMETYPES.items():
+        file_path = os.path.join(PREVIEW_DIR, f'{token}.{fmt}')
+        if os.path.exists(file_path):
+            return file_path, mimetype
 
-    return base64_str
+    return None
+
+
+def _cleanup_previews():
+    """Remove stored images older than PREVIEW_TTL_SECONDS (at most once a minute)"""
+    global _last_preview_cleanup
+
+    now = time.time()
+    if now - _last_preview_cleanup < 60:
+        return
+    _last_preview_cleanup = now
+
+    for entry in os.scandir(PREVIEW_DIR):
+        try:
+            if now - entry.stat().st_mtime > PREVIEW_TTL_SECONDS:
+                os.remove(entry.path)
+        except OSError:
+            # Already removed by another worker
+            pass
 
 
 def base64_to_numpy(base64_str):
@@ -202,25 +483,286 @@ def base64_to_numpy(base64_str):
     return image
 
 
-def bytes_to_numpy(image_bytes):
+def bytes_to_numpy(image_bytes, target_width=None, target_height=None, max_scale=MAX_DECODE_SCALE):
     """
     Convert bytes to numpy array image
 
     Args:
-        image_bytes: Image data as bytes
+        image_bytes: Image data as bytes or a uint8 numpy array
+        target_width: Optional width the image will be resized to
+        target_height: Optional height the image will be resized to
+        max_scale: Largest allowed decode downscale factor (1, 2, 4 or 8)
 
     Returns:
         Numpy array representing image (grayscale)
     """
+    # Decode image as GRAYSCALE to match original OMRChecker behavior,
+    # letting libjpeg downscale oversized JPEGs while decoding
+    scale = get_decode_scale(image_bytes, target_width, target_height, max_scale)
+
+    # Prefer libjpeg-turbo when installed, except for EXIF images
+    # since only OpenCV applies their orientation
+    turbo_jpeg = get_turbo_jpeg()
+    if turbo_jpeg is not None and get_jpeg_size(image_bytes) and not has_jpeg_exif(image_bytes):
+        image = _decode_turbo_jpeg(turbo_jpeg, image_bytes, scale)
+        if image is not None:
+            return image
+
     # Convert to numpy array
     nparr = np.frombuffer(image_bytes, np.uint8)
+    image = cv2.imdecode(nparr, REDUCED_GRAYSCALE_FLAGS[scale])
+
+    return image
+
+
+@functools.lru_cache(maxsize=1)
+def get_turbo_jpeg():
+    """
+    Get the shared PyTurboJPEG decoder, loaded on first use
+
+    Returns:
+        TurboJPEG instance, or None if PyTurboJPEG (or libjpeg-turbo) is not installed
+    """
+    try:
+        from turbojpeg import TurboJPEG
+        return TurboJPEG()
+    except (ImportError, OSError, RuntimeError):
+        return None
+
+
+def _decode_turbo_jpeg(turbo_jpeg, image_bytes, scale):
+    """Decode a JPEG as grayscale with PyTurboJPEG, None if it can't be decoded"""
+    from turbojpeg import TJPF_GRAY
+
+    try:
+        image = turbo_jpeg.decode(
+            image_bytes,
+            pixel_format=TJPF_GRAY,
+            scaling_factor=(1, scale) if scale > 1 else None
+        )
+    except (OSError, ValueError):
+        return None
+    # Decoded as HxWx1, match the 2-D images of cv2.imdecode
+    return image.reshape(image.shape[:2])
+
+
+def as_decoded_image(image_data):
+    """
+    Get image data that is already decoded as a grayscale numpy array image
+
+    Args:
+        image_data: Image data as bytes, a uint8 numpy array or any object
+            exposing an array through __array_interface__ (e.g. a PIL image)
 
-    # Decode image as GRAYSCALE to match original OMRChecker behavior
-    image = cv2.imdecode(nparr, cv2.IMREAD_GRAYSCALE)
+    Returns:
+        Numpy array representing image (grayscale), or None if image_data
+        is encoded (bytes or a 1-D buffer)
 
+    Raises:
+        ValueError: If the decoded image is not a uint8 grayscale or BGR image
+    """
+    if not hasattr(image_data, '__array_interface__'):
+        return None
+
+    image = np.asarray(image_data)
+    if image.ndim < 2:
+        return None
+
+    if image.dtype != np.uint8:
+        raise ValueError(f'Decoded images must be uint8, got {image.dtype}')
+    if image.ndim == 3 and image.shape[2] == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if image.ndim == 3 and image.shape[2] == 1:
+        return image[:, :, 0]
+    if image.ndim != 2:
+        raise ValueError(f'Decoded images must be grayscale or BGR, got shape {image.shape}')
     return image
 
 
+def get_jpeg_size(image_bytes):
+    """
+    Read JPEG dimensions from its header without decoding
+
+    Args:
+        image_bytes: Image data as bytes or a uint8 numpy array
+
+    Returns:
+        Tuple (width, height), or None if not a (parsable) JPEG
+    """
+    # Works on bytes and numpy buffers alike, without copying
+    image_bytes = memoryview(image_bytes)
+    for marker, index in _iter_jpeg_segments(image_bytes):
+        if marker in _JPEG_SOF_MARKERS:
+            height = int.from_bytes(image_bytes[index + 5:index + 7], 'big')
+            width = int.from_bytes(image_bytes[index + 7:index + 9], 'big')
+            return width, height
+
+    return None
+
+
+def has_jpeg_exif(image_bytes):
+    """
+    Check whether a JPEG carries EXIF metadata (which may rotate it on decode)
+
+    Args:
+        image_bytes: Image data as bytes or a uint8 numpy array
+
+    Returns:
+        True if an EXIF (APP1) segment precedes the image data
+    """
+    image_bytes = memoryview(image_bytes)
+    return any(
+        marker == 0xE1 and image_bytes[index + 4:index + 10] == b'Exif\x00\x00'
+        for marker, index in _iter_jpeg_segments(image_bytes)
+    )
+
+
+def _iter_jpeg_segments(image_bytes):
+    """
+    Yield (marker, index) of the JPEG header segments, up to the first frame (SOF) one
+
+    Args:
+        image_bytes: Image data as a memoryview
+    """
+    if image_bytes[:2] != b'\xff\xd8':
+        return
+
+    index = 2
+    length = len(image_bytes)
+    while index + 9 < length:
+        if image_bytes[index] != 0xFF:
+            return
+        marker = image_bytes[index + 1]
+        if marker == 0xFF:
+            # Fill byte
+            index += 1
+            continue
+        yield marker, index
+        if marker in _JPEG_SOF_MARKERS:
+            return
+        segment_length = int.from_bytes(image_bytes[index + 2:index + 4], 'big')
+        index += 2 + segment_length
+
+
+def get_image_dimensions(image_bytes, image):
+    """
+    Get [height, width] of the source image, which differs from the decoded
+    array's shape when the image was decoded at a reduced size
+
+    Args:
+        image_bytes: Image data as bytes or a uint8 numpy array
+        image: Decoded numpy array image
+
+    Returns:
+        List [height, width]
+    """
+    size = get_jpeg_size(image_bytes)
+    if size is None:
+        height, width = image.shape[:2]
+        return [height, width]
+
+    width, height = size
+    # Match the (EXIF) orientation of the decoded image
+    if (image.shape[0] > image.shape[1]) != (height > width):
+        width, height = height, width
+    return [height, width]
+
+
+def get_decode_scale(image_bytes, target_width=None, target_height=None, max_scale=MAX_DECODE_SCALE):
+    """
+    Pick the largest JPEG decode downscale factor that keeps the image
+    at least as large as the target dimensions
+
+    Args:
+        image_bytes: Image data as bytes or a uint8 numpy array
+        target_width: Width the image will be resized to
+        target_height: Height the image will be resized to
+        max_scale: Largest allowed downscale factor (1, 2, 4 or 8)
+
+    Returns:
+        Downscale factor, one of 1, 2, 4, 8
+    """
+    if not target_width or not target_height:
+        return 1
+
+    size = get_jpeg_size(image_bytes)
+    if size is None:
+        return 1
+
+    width, height = size
+    if has_jpeg_exif(image_bytes):
+        # The EXIF orientation may swap the axes on decode, so both of them
+        # have to stay at least as large as the larger target side
+        width = height = min(width, height)
+        target_width = target_height = max(target_width, target_height)
+
+    for scale in (8, 4, 2):
+        if scale > max_scale:
+            continue
+        if (math.ceil(width / scale) >= target_width
+                and math.ceil(height / scale) >= target_height):
+            return scale
+
+    return 1
+
+
+def create_json_response(result_data, status=200):
+    """
+    Create JSON response from result data
+
+    Serializes straight to bytes, skipping jsonify's str round trip
+    (intended for large processing results)
+
+    Args:
+        result_data: Dictionary with processing results
+        status: HTTP status code
+
+    Returns:
+        Flask response with JSON
+    """
+    return Response(
+        orjson.dumps(result_data, default=DefaultJSONProvider.default, option=ORJSON_OPTIONS),
+        status=status,
+        mimetype='application/json'
+    )
+
+
+def create_ndjson_response(results, start_time):
+    """
+    Create streaming NDJSON response from an iterator of results
+
+    Each result is written as one JSON line as soon as it is produced,
+    followed by a summary line with the batch totals
+
+    Args:
+        results: Iterator of result dictionaries (e.g. process_omr_batch_iter)
+        start_time: time.time() of the start of the request
+
+    Returns:
+        Flask streaming response with NDJSON
+    """
+    def generate():
+        successful = 0
+        failed = 0
+
+        for result in results:
+            if result['status'] == 'success':
+                successful += 1
+            else:
+                failed += 1
+            yield orjson.dumps(result, default=DefaultJSONProvider.default, option=ORJSON_OPTIONS) + b'\n'
+
+        yield orjson.dumps({
+            'status': 'success',
+            'total': successful + failed,
+            'successful': successful,
+            'failed': failed,
+            'processing_time': round(time.time() - start_time, 2)
+        }) + b'\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
 def create_csv_response(result_data):
     """
     Create CSV file response from result data
@@ -229,33 +771,39 @@ def create_csv_response(result_data):
         result_data: Dictionary with processing results
 
     Returns:
-        Flask send_file response with CSV
+        Flask streaming response with CSV
     """
-    # Convert results to DataFrame
     if 'results' in result_data:
         # Batch results
-        df = pd.DataFrame(result_data['results'])
+        rows = result_data['results']
     else:
         # Single result
-        df = pd.DataFrame([{
+        rows = [{
             'file_name': result_data.get('file_name', 'unknown'),
             'status': result_data.get('status', 'success'),
             **result_data.get('response', {})
-        }])
+        }]
+
+    # Columns in order of first appearance across all rows
+    headers = list(dict.fromkeys(key for row in rows for key in row))
+
+    def generate():
+        buffer = StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=headers, restval='', lineterminator='\n')
 
-    # Create CSV in memory
-    output = StringIO()
-    df.to_csv(output, index=False)
-    output.seek(0)
+        writer.writeheader()
+        yield buffer.getvalue()
 
-    # Convert to bytes
-    csv_bytes = BytesIO(output.getvalue().encode('utf-8'))
+        for row in rows:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerow(row)
+            yield buffer.getvalue()
 
-    return send_file(
-        csv_bytes,
+    return Response(
+        generate(),
         mimetype='text/csv',
-        as_attachment=True,
-        download_name='omr_results.csv'
+        headers={'Content-Disposition': 'attachment; filename=omr_results.csv'}
     )
 
 
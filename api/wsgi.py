@@ -0,0 +1,8 @@
+"""
+WSGI entry point for OMR Checker API
+Used by production servers, e.g.: gunicorn -c gunicorn.conf.py api.wsgi:application
+"""
+
+from api.app import create_app
+
+application = create_app()
@@ -0,0 +1,50 @@
+"""
+Gunicorn configuration for OMR Checker API
+
+Usage:
+    gunicorn -c gunicorn.conf.py api.wsgi:application
+"""
+
+import multiprocessing
+import os
+
+# Parallelism comes from the worker processes, so keep native thread pools
+# to a single thread per worker to avoid oversubscribing the cores.
+# Must be set before numpy/OpenCV are loaded by preload_app.
+for _thread_env in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+    os.environ.setdefault(_thread_env, '1')
+
+bind = os.environ.get('OMR_API_BIND', '0.0.0.0:8080')
+
+# OMR processing is CPU-bound, so scale with the available cores
+workers = int(os.environ.get('OMR_API_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+
+# The default worker count already keeps every core busy, so the per-worker
+# process pool for multi-image batches (api/pool.py) is off unless enabled
+# with OMR_API_PARALLEL_BATCH=1, together with fewer workers than cores.
+# The cores are then shared between the workers' pools instead of giving
+# each one all of them (e.g. 2 workers on 8 cores get a pool of 4 each)
+os.environ.setdefault('OMR_API_PARALLEL_BATCH', '0')
+os.environ.setdefault('OMR_API_POOL_WORKERS', str(max(1, multiprocessing.cpu_count() // workers)))
+
+# Threaded workers, so a progress stream (SSE) of a background job only
+# holds one thread, and the worker keeps sending heartbeats to the master
+# while requests run: long streams and uploads aren't killed by `timeout`
+worker_class = 'gthread'
+threads = int(os.environ.get('OMR_API_THREADS', 4))
+
+# Seconds without a heartbeat before a stuck worker is restarted. Background
+# jobs run in threads of the worker that accepted them and are lost when it
+# restarts; their progress/results are shared between the workers through
+# files (see api/jobs.py), so any worker can serve them
+timeout = 120
+
+# Load the app (OpenCV, numpy and the OMR pipeline) once in the master
+# and share it with the forked workers via copy-on-write
+preload_app = True
+
+
+def post_fork(server, worker):
+    """Limit OpenCV to a single thread in each worker"""
+    import cv2
+    cv2.setNumThreads(1)
@@ -4,36 +4,79 @@ Wraps core OMR processing functions to work with in-memory data instead of file
 """
 
 import os
+import copy
+import functools
+import itertools
 import cv2
+import orjson
 import numpy as np
-from io import BytesIO
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from uuid import uuid4
 from deepmerge import always_merger
+from dotmap import DotMap
 
 from src.template import Template
 from src.core import ImageInstanceOps
+from src.constants.common import TEMPLATE_FILENAME, CONFIG_FILENAME
 from src.defaults import CONFIG_DEFAULTS
 from src.utils.parsing import get_concatenated_response, open_config_with_defaults
 from src.evaluation import EvaluationConfig, evaluate_concatenated_response
-from api.utils import numpy_to_base64, bytes_to_numpy, get_default_config
+from api.pool import should_parallelize, iter_completed
+from api.utils import (
+    PREVIEW_MIMETYPES,
+    MAX_DECODE_SCALE,
+    numpy_to_base64,
+    store_preview,
+    bytes_to_numpy,
+    as_decoded_image,
+    get_image_dimensions,
+    get_default_config
+)
+
+# Number of files read ahead of processing in directory mode
+DIR_READ_AHEAD = 4
+
+
+def warmup():
+    """
+    Prime OpenCV/numpy and the API config defaults so the first image
+    processed doesn't pay for their lazy initialization
+
+    Called at app startup and in each batch pool worker process
+    """
+    _, buffer = cv2.imencode('.jpg', np.full((64, 64), 255, dtype=np.uint8))
+    image = bytes_to_numpy(buffer.tobytes())
+    image = cv2.GaussianBlur(cv2.resize(image, (32, 32)), (3, 3), 0)
+    cv2.normalize(image, None, 0, 255, norm_type=cv2.NORM_MINMAX)
+    numpy_to_base64(image)
+
+    _prepare_config(None, auto_align=False)
 
 
 def process_omr_image(
-    image_data: bytes,
+    image_data: Union[bytes, BinaryIO, np.ndarray],
     template_data: Dict,
     config_data: Optional[Dict] = None,
     marker_data: Optional[bytes] = None,
     file_name: str = "image.jpg",
     include_image: bool = False,
     auto_align: bool = False,
-    evaluation_data: Optional[Dict] = None
+    evaluation_data: Optional[Dict] = None,
+    image_format: str = 'jpg',
+    image_delivery: str = 'base64',
+    max_decode_scale: int = MAX_DECODE_SCALE
 ) -> Dict:
     """
     Process a single OMR image from memory
 
     Args:
-        image_data: Image bytes
+        image_data: Image bytes or a readable binary stream, or an already decoded
+            uint8 image (grayscale HxW or BGR HxWx3 array, or any object exposing
+            one through __array_interface__) that is used without decoding
         template_data: Template configuration dictionary
         config_data: Optional config dictionary
         marker_data: Optional marker image bytes
@@ -41,39 +84,349 @@ def process_omr_image(
         include_image: Whether to include processed image in response
         auto_align: Enable automatic alignment
         evaluation_data: Optional evaluation config for scoring
+        image_format: Format of the included processed image ('jpg' or 'png')
+        image_delivery: 'base64' to inline the processed image, 'url' to store
+            it and return its download URL
+        max_decode_scale: Largest factor (1, 2, 4 or 8) by which oversized JPEGs
+            may be downscaled while decoding, 1 to always decode at full size
 
     Returns:
         Dictionary with processing results
     """
+    prepared = _try_prepare_processing({
+        'template_data': template_data,
+        'config_data': config_data,
+        'marker_data': marker_data,
+        'auto_align': auto_align
+    })
+
+    return _process_prepared(prepared, image_data, file_name, {
+        'include_image': include_image,
+        'evaluation_data': evaluation_data,
+        'image_format': image_format,
+        'image_delivery': image_delivery,
+        'max_decode_scale': max_decode_scale
+    })
+
+
+def process_omr_batch(
+    images_data: List[Union[bytes, BinaryIO]],
+    file_names: List[str],
+    template_data: Dict,
+    config_data: Optional[Dict] = None,
+    marker_data: Optional[bytes] = None,
+    include_images: bool = False,
+    auto_align: bool = False,
+    evaluation_data: Optional[Dict] = None,
+    progress_callback: Optional[Callable[[int, int, Dict], None]] = None,
+    image_format: str = 'jpg',
+    image_delivery: str = 'base64',
+    max_decode_scale: int = MAX_DECODE_SCALE
+) -> Dict:
+    """
+    Process multiple OMR images from memory
+
+    Args:
+        images_data: List of image bytes or readable binary streams
+        file_names: List of file names
+        template_data: Template configuration dictionary
+        config_data: Optional config dictionary
+        marker_data: Optional marker image bytes
+        include_images: Whether to include processed images in response
+        auto_align: Enable automatic alignment
+        evaluation_data: Optional evaluation config for scoring
+        progress_callback: Optional callable(processed, total, result) invoked
+            after each image
+        image_format: Format of the included processed images ('jpg' or 'png')
+        image_delivery: 'base64' to inline the processed images, 'url' to store
+            them and return their download URLs
+        max_decode_scale: Largest factor (1, 2, 4 or 8) by which oversized JPEGs
+            may be downscaled while decoding, 1 to always decode at full size
+
+    Returns:
+        Dictionary with batch processing results
+    """
+    total = len(images_data)
+    results = [None] * total
+    successful = 0
+    failed = 0
+
+    completed = _iter_batch_results(
+        images_data,
+        file_names,
+        template_data,
+        config_data=config_data,
+        marker_data=marker_data,
+        include_images=include_images,
+        auto_align=auto_align,
+        evaluation_data=evaluation_data,
+        image_format=image_format,
+        image_delivery=image_delivery,
+        max_decode_scale=max_decode_scale
+    )
+
+    for processed, (index, result) in enumerate(completed, start=1):
+        results[index] = result
+
+        if result['status'] == 'success':
+            successful += 1
+        else:
+            failed += 1
+
+        if progress_callback:
+            progress_callback(processed, total, result)
+
+    return {
+        'status': 'success',
+        'total': total,
+        'successful': successful,
+        'failed': failed,
+        'results': results
+    }
+
+
+def process_omr_batch_iter(
+    images_data: List[Union[bytes, BinaryIO]],
+    file_names: List[str],
+    template_data: Dict,
+    config_data: Optional[Dict] = None,
+    marker_data: Optional[bytes] = None,
+    include_images: bool = False,
+    auto_align: bool = False,
+    evaluation_data: Optional[Dict] = None,
+    image_format: str = 'jpg',
+    image_delivery: str = 'base64',
+    max_decode_scale: int = MAX_DECODE_SCALE
+) -> Iterator[Dict]:
+    """
+    Process multiple OMR images from memory, yielding each result as soon
+    as it is ready (in order of completion when the batch is parallelized)
+
+    Takes the same arguments as process_omr_batch (without progress_callback)
+
+    Yields:
+        Dictionary with processing results of one image
+    """
+    for _, result in _iter_batch_results(
+        images_data,
+        file_names,
+        template_data,
+        config_data=config_data,
+        marker_data=marker_data,
+        include_images=include_images,
+        auto_align=auto_align,
+        evaluation_data=evaluation_data,
+        image_format=image_format,
+        image_delivery=image_delivery,
+        max_decode_scale=max_decode_scale
+    ):
+        yield result
+
+
+def _iter_batch_results(
+    images_data: List[Union[bytes, BinaryIO]],
+    file_names: List[str],
+    template_data: Dict,
+    config_data: Optional[Dict] = None,
+    marker_data: Optional[bytes] = None,
+    include_images: bool = False,
+    auto_align: bool = False,
+    evaluation_data: Optional[Dict] = None,
+    image_format: str = 'jpg',
+    image_delivery: str = 'base64',
+    max_decode_scale: int = MAX_DECODE_SCALE
+) -> Iterator[Tuple[int, Dict]]:
+    """
+    Process batch images, yielding (index, result) tuples as they complete
+
+    The template, config and image processor are built once per batch
+    (once per pool worker when the batch is parallelized)
+    """
+    prepare_options = {
+        'template_data': template_data,
+        'config_data': config_data,
+        'marker_data': marker_data,
+        'auto_align': auto_align
+    }
+    process_options = {
+        'include_image': include_images,
+        'evaluation_data': evaluation_data,
+        'image_format': image_format,
+        'image_delivery': image_delivery,
+        'max_decode_scale': max_decode_scale
+    }
+
+    if should_parallelize(len(images_data)):
+        # Spread the images across the process pool
+        # (streams can't be pickled, so hand over the bytes)
+        batch_id = uuid4().hex
+        tasks = [
+            (
+                batch_id,
+                image_data.read() if hasattr(image_data, 'read') else image_data,
+                file_name,
+                prepare_options,
+                process_options
+            )
+            for image_data, file_name in zip(images_data, file_names)
+        ]
+        finished = set()
+        try:
+            for index, result in iter_completed(_process_single_worker, tasks):
+                finished.add(index)
+                yield index, result
+        except BrokenProcessPool:
+            # A pool process died, report the images it didn't finish
+            for index, file_name in enumerate(file_names):
+                if index not in finished:
+                    yield index, {
+                        'status': 'error',
+                        'file_name': file_name,
+                        'message': 'Processing failed - the worker process terminated unexpectedly'
+                    }
+    else:
+        prepared = _try_prepare_processing(prepare_options)
+        for index, (image_data, file_name) in enumerate(zip(images_data, file_names)):
+            yield index, _process_prepared(prepared, image_data, file_name, process_options)
+
+
+# Prepared template/config of the latest batch, per pool worker process
+_worker_batch = {}
+
+
+def _process_single_worker(task: tuple) -> Dict:
+    """
+    Process one batch image in a pool worker
+
+    Module-level so it can be sent to the process pool. The task is
+    (batch_id, image_data, file_name, prepare_options, process_options);
+    each worker prepares the template/config once per batch_id.
+    """
+    batch_id, image_data, file_name, prepare_options, process_options = task
+
+    if batch_id not in _worker_batch:
+        _worker_batch.clear()
+        _worker_batch[batch_id] = _try_prepare_processing(prepare_options)
+
+    return _process_prepared(_worker_batch[batch_id], image_data, file_name, process_options)
+
+
+def _prepare_processing(
+    template_data: Dict,
+    config_data: Optional[Dict] = None,
+    marker_data: Optional[bytes] = None,
+    auto_align: bool = False,
+    relative_dir: Optional[str] = None
+) -> Tuple:
+    """
+    Build the config, template and image processor shared by the images of a request
+
+    Returns:
+        Tuple (config, template, image_ops)
+    """
+    config = _prepare_config(config_data, auto_align, disable_display=True)
+
+    template = _create_template_from_dict(
+        template_data,
+        config,
+        marker_data=marker_data,
+        relative_dir=relative_dir
+    )
+
+    return config, template, ImageInstanceOps(config)
+
+
+def _try_prepare_processing(prepare_options: Dict) -> Union[Tuple, Exception]:
+    """Same as _prepare_processing, returning the exception instead of raising"""
     try:
-        # Convert bytes to numpy array
-        image = bytes_to_numpy(image_data)
+        return _prepare_processing(**prepare_options)
+    except Exception as e:
+        return e
 
-        if image is None:
-            return {
-                'status': 'error',
-                'file_name': file_name,
-                'message': 'Failed to decode image'
-            }
 
-        # Prepare configuration
-        config = _prepare_config(config_data, auto_align, disable_display=True)
+def _process_prepared(
+    prepared: Union[Tuple, Exception],
+    image_data: Union[bytes, BinaryIO, np.ndarray],
+    file_name: str,
+    process_options: Dict
+) -> Dict:
+    """Process an image with the result of _try_prepare_processing"""
+    if isinstance(prepared, Exception):
+        return {
+            'status': 'error',
+            'file_name': file_name,
+            'message': str(prepared)
+        }
+
+    config, template, image_ops = prepared
+    return _process_with_prepared(image_data, file_name, config, template, image_ops, **process_options)
 
-        # Create template from data
-        template = _create_template_from_dict(
-            template_data,
-            config,
-            marker_data=marker_data,
-            relative_dir=None
-        )
 
-        # Create image processor
-        image_ops = ImageInstanceOps(config)
+def _process_with_prepared(
+    image_data: Union[bytes, BinaryIO, np.ndarray],
+    file_name: str,
+    config: object,
+    template: Template,
+    image_ops: ImageInstanceOps,
+    include_image: bool = False,
+    evaluation_data: Optional[Dict] = None,
+    image_format: str = 'jpg',
+    image_delivery: str = 'base64',
+    max_decode_scale: int = MAX_DECODE_SCALE
+) -> Dict:
+    """
+    Process a single OMR image with a prepared config, template and image processor
+
+    Args:
+        image_data: Image bytes or a readable binary stream, or an already decoded
+            uint8 image (grayscale HxW or BGR HxWx3 array, or any object exposing
+            one through __array_interface__) that is used without decoding
+        file_name: Name of the file (for reference)
+        config: Configuration object from _prepare_config
+        template: Template object
+        image_ops: Image processor for config
+        include_image: Whether to include processed image in response
+        evaluation_data: Optional evaluation config for scoring
+        image_format: Format of the included processed image ('jpg' or 'png')
+        image_delivery: 'base64' to inline the processed image, 'url' to store
+            it and return its download URL
+        max_decode_scale: Largest factor (1, 2, 4 or 8) by which oversized JPEGs
+            may be downscaled while decoding, 1 to always decode at full size
+
+    Returns:
+        Dictionary with processing results
+    """
+    try:
+        # Convert bytes/stream to numpy array, decoding oversized JPEGs
+        # directly at a reduced size close to the processing dimensions
+        if hasattr(image_data, 'read'):
+            image_data = image_data.read()
+        image = as_decoded_image(image_data)
+        if image is not None:
+            height, width = image.shape[:2]
+            image_dimensions = [height, width]
+        else:
+            image = bytes_to_numpy(
+                image_data,
+                config.dimensions.processing_width,
+                config.dimensions.processing_height,
+                max_scale=max_decode_scale
+            )
+
+            if image is None:
+                return {
+                    'status': 'error',
+                    'file_name': file_name,
+                    'message': 'Failed to decode image'
+                }
+
+            image_dimensions = get_image_dimensions(image_data, image)
 
         # Apply preprocessors
-        # For preprocessors that need file_path, we create a temporary Path object
-        temp_path = Path(file_name)
-        processed_image = image_ops.apply_preprocessors(temp_path, image, template)
+        # (file_path is only used in their log messages, the name will do)
+        processed_image = image_ops.apply_preprocessors(file_name, image, template)
+        # Release the decoded image, only the preprocessed one is needed from here
+        del image
 
         # Check if preprocessing succeeded (CropOnMarkers may return None if markers not found)
         if processed_image is None:
@@ -95,16 +448,17 @@ def process_omr_image(
         concatenated_response = get_concatenated_response(omr_response, template)
 
         # Build result
+        multi_marked_count = int(multi_marked)
         result = {
             'status': 'success',
             'file_name': file_name,
             'response': concatenated_response,
             'raw_response': omr_response,
             'metadata': {
-                'multi_marked': bool(multi_marked),
+                'multi_marked': multi_marked_count != 0,
                 'multi_roll': bool(multi_roll),
-                'multi_marked_count': int(multi_marked),
-                'image_dimensions': list(image.shape[:2])
+                'multi_marked_count': multi_marked_count,
+                'image_dimensions': image_dimensions
             }
         }
 
@@ -120,7 +474,7 @@ def process_omr_image(
 
         # Add processed image if requested
         if include_image and final_marked is not None:
-            result['processed_image'] = numpy_to_base64(final_marked)
+            _add_processed_image(result, final_marked, image_format, image_delivery)
 
         return result
 
@@ -132,68 +486,24 @@ def process_omr_image(
         }
 
 
-def process_omr_batch(
-    images_data: List[bytes],
-    file_names: List[str],
-    template_data: Dict,
-    config_data: Optional[Dict] = None,
-    marker_data: Optional[bytes] = None,
-    include_images: bool = False,
-    auto_align: bool = False,
-    evaluation_data: Optional[Dict] = None
-) -> Dict:
+def _add_processed_image(result: Dict, image: np.ndarray, image_format: str, image_delivery: str):
     """
-    Process multiple OMR images from memory
-
-    Args:
-        images_data: List of image bytes
-        file_names: List of file names
-        template_data: Template configuration dictionary
-        config_data: Optional config dictionary
-        marker_data: Optional marker image bytes
-        include_images: Whether to include processed images in response
-        auto_align: Enable automatic alignment
-        evaluation_data: Optional evaluation config for scoring
-
-    Returns:
-        Dictionary with batch processing results
+    Attach the processed image to a result, inline (base64) or as a download URL
     """
-    results = []
-    successful = 0
-    failed = 0
-
-    for image_data, file_name in zip(images_data, file_names):
-        result = process_omr_image(
-            image_data=image_data,
-            template_data=template_data,
-            config_data=config_data,
-            marker_data=marker_data,
-            file_name=file_name,
-            include_image=include_images,
-            auto_align=auto_align,
-            evaluation_data=evaluation_data
-        )
-
-        results.append(result)
-
-        if result['status'] == 'success':
-            successful += 1
-        else:
-            failed += 1
-
-    return {
-        'status': 'success',
-        'total': len(images_data),
-        'successful': successful,
-        'failed': failed,
-        'results': results
-    }
+    if image_delivery == 'url':
+        result['processed_image_url'] = store_preview(image, fmt=image_format)
+    else:
+        result['processed_image'] = numpy_to_base64(image, fmt=image_format)
+    result['processed_image_mimetype'] = PREVIEW_MIMETYPES[image_format]
 
 
 def _prepare_config(config_data: Optional[Dict], auto_align: bool, disable_display: bool = True) -> object:
     """
     Prepare configuration object from dictionary
 
+    Configs are cached by content, so the returned object is shared and
+    must not be modified
+
     Args:
         config_data: Configuration dictionary
         auto_align: Enable automatic alignment
@@ -202,33 +512,64 @@ def _prepare_config(config_data: Optional[Dict], auto_align: bool, disable_displ
     Returns:
         Configuration object
     """
-    # Start with defaults
-    config = get_default_config()
+    # orjson serializes a DotMap (e.g. from open_config_with_defaults) as {}
+    if isinstance(config_data, DotMap):
+        config_data = config_data.toDict()
+    config_json = orjson.dumps(config_data, option=orjson.OPT_SORT_KEYS) if config_data else b''
+    return _prepare_config_cached(config_json, auto_align, disable_display)
+
+
+@functools.lru_cache(maxsize=64)
+def _prepare_config_cached(config_json: bytes, auto_align: bool, disable_display: bool) -> 'AttrDict':
+    """Build the configuration object of _prepare_config from serialized config_data"""
+    # Start with (a copy of) CONFIG_DEFAULTS and the API defaults
+    config = copy.deepcopy(_api_config_defaults())
 
-    # Merge with provided config
-    if config_data:
-        config = always_merger.merge(config, config_data)
+    # Merge with provided config (nothing to merge without one)
+    if config_json:
+        config = always_merger.merge(config, orjson.loads(config_json))
 
     # Override for API mode
     if disable_display:
-        if 'outputs' not in config:
-            config['outputs'] = {}
         config['outputs']['show_image_level'] = 0
         config['outputs']['save_image_level'] = 0
 
     # Set auto_align
-    if 'alignment_params' not in config:
-        config['alignment_params'] = {}
     config['alignment_params']['auto_align'] = auto_align
 
     # Convert to config object
-    from dotmap import DotMap
-    config_obj = DotMap(config, _dynamic=False)
+    return AttrDict.from_dict(config)
 
-    # Merge with CONFIG_DEFAULTS to ensure all required fields exist
-    final_config = always_merger.merge(CONFIG_DEFAULTS, config_obj)
 
-    return final_config
+@functools.lru_cache(maxsize=1)
+def _api_config_defaults() -> Dict:
+    """CONFIG_DEFAULTS merged with the API defaults, shared and must not be modified"""
+    return always_merger.merge(CONFIG_DEFAULTS.toDict(), get_default_config())
+
+
+class AttrDict(dict):
+    """
+    Dictionary with attribute access to its keys, used for prepared configs
+
+    Unlike DotMap, nested dictionaries are converted once up front and
+    attribute reads are plain dict lookups
+    """
+
+    __slots__ = ()
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'AttrDict':
+        """Recursively convert a dictionary and its nested dictionaries"""
+        return cls(
+            (key, cls.from_dict(value) if isinstance(value, dict) else value)
+            for key, value in data.items()
+        )
 
 
 def _create_template_from_dict(
@@ -249,45 +590,64 @@ def _create_template_from_dict(
     Returns:
         Template object
     """
-    import cv2
-    import os
-
     # If marker data is provided and template uses CropOnMarkers,
-    # we need to save it temporarily
-    temp_marker_path = None
+    # hand the decoded marker over in memory
+    marker_image = None
 
     if marker_data and 'preProcessors' in template_data:
-        for processor in template_data['preProcessors']:
-            if processor.get('name') == 'CropOnMarkers':
-                # Save marker temporarily
-                temp_marker_path = '/tmp/omr_marker_temp.jpg'
-                marker_image = bytes_to_numpy(marker_data)
-                cv2.imwrite(temp_marker_path, marker_image)
-
-                # Update absolute path in template
-                if 'options' in processor:
-                    processor['options']['relativePath'] = temp_marker_path
+        if any(processor.get('name') == 'CropOnMarkers' for processor in template_data['preProcessors']):
+            marker_image = bytes_to_numpy(marker_data)
+            if marker_image is None:
+                raise ValueError('Failed to decode marker image')
 
     # If relative_dir is provided and no marker_data, convert relative paths to absolute
+    # (on copies, template_data may be shared)
     elif relative_dir and 'preProcessors' in template_data:
+        pre_processors = []
         for processor in template_data['preProcessors']:
             if processor.get('name') == 'CropOnMarkers':
                 if 'options' in processor and 'relativePath' in processor['options']:
                     rel_path = processor['options']['relativePath']
                     # Convert to absolute path
                     abs_path = os.path.join(relative_dir, rel_path)
-                    processor['options']['relativePath'] = abs_path
+                    processor = {
+                        **processor,
+                        'options': {**processor['options'], 'relativePath': abs_path}
+                    }
+            pre_processors.append(processor)
+        template_data = {**template_data, 'preProcessors': pre_processors}
 
     # Create template from dictionary
-    template = Template.from_dict(template_data, config, relative_dir=relative_dir)
+    template = Template.from_dict(
+        template_data,
+        config,
+        relative_dir=relative_dir,
+        marker_image=marker_image
+    )
 
     return template
 
 
+@functools.lru_cache(maxsize=32)
+def _load_template_cached(template_path: str, mtime_ns: int) -> Dict:
+    """Parse a directory's template.json, shared and must not be modified"""
+    with open(template_path, 'rb') as f:
+        return orjson.loads(f.read())
+
+
+@functools.lru_cache(maxsize=32)
+def _load_config_cached(config_path: str, mtime_ns: int) -> Dict:
+    """Load a directory's config.json with defaults, shared and must not be modified"""
+    return open_config_with_defaults(config_path).toDict()
+
+
 def process_dir_for_api(
     input_dir: str,
     include_images: bool = False,
-    auto_align: bool = False
+    auto_align: bool = False,
+    image_format: str = 'jpg',
+    image_delivery: str = 'base64',
+    max_decode_scale: int = MAX_DECODE_SCALE
 ) -> Dict:
     """
     Process a directory of OMR images (for directory path mode)
@@ -296,13 +656,15 @@ def process_dir_for_api(
         input_dir: Path to input directory
         include_images: Whether to include processed images
         auto_align: Enable automatic alignment
+        image_format: Format of the included processed images ('jpg' or 'png')
+        image_delivery: 'base64' to inline the processed images, 'url' to store
+            them and return their download URLs
+        max_decode_scale: Largest factor (1, 2, 4 or 8) by which oversized JPEGs
+            may be downscaled while decoding, 1 to always decode at full size
 
     Returns:
         Dictionary with processing results
     """
-    from src.entry import process_dir
-    from src.constants.common import TEMPLATE_FILENAME, CONFIG_FILENAME
-
     input_path = Path(input_dir)
 
     if not input_path.exists():
@@ -321,14 +683,12 @@ def process_dir_for_api(
             'message': f'Template file not found in directory: {TEMPLATE_FILENAME}'
         }
 
-    # Load template and config
-    with open(template_path, 'r') as f:
-        import json
-        template_data = json.load(f)
+    # Load template and config (cached until the files change)
+    template_data = _load_template_cached(str(template_path), template_path.stat().st_mtime_ns)
 
     config_data = None
     if config_path.exists():
-        config_data = open_config_with_defaults(config_path)
+        config_data = _load_config_cached(str(config_path), config_path.stat().st_mtime_ns)
 
     # Get all image files
     image_extensions = {'.png', '.jpg', '.jpeg'}
@@ -356,109 +716,72 @@ def process_dir_for_api(
         with open(marker_path, 'rb') as f:
             marker_data = f.read()
 
-    # Process all images
-    images_data = []
-    file_names = []
-
-    for img_file in image_files:
-        with open(img_file, 'rb') as f:
-            images_data.append(f.read())
-        file_names.append(img_file.name)
-
-    # Process batch with relative directory for marker files
-    results = []
-    successful = 0
-    failed = 0
-
-    # Prepare config
-    config = _prepare_config(config_data, auto_align, disable_display=True)
-
-    # Create template with relative directory
-    template = _create_template_from_dict(
+    # Prepare config, template (with relative directory for marker files)
+    # and image processor once for all images
+    config, template, image_ops = _prepare_processing(
         template_data,
-        config,
+        config_data,
         marker_data=marker_data,
+        auto_align=auto_align,
         relative_dir=str(input_path)
     )
 
-    # Process each image
-    from src.core import ImageInstanceOps
-    from src.utils.parsing import get_concatenated_response
-
-    image_ops = ImageInstanceOps(config)
-
-    for image_data, file_name in zip(images_data, file_names):
-        try:
-            # Convert bytes to numpy
-            image = bytes_to_numpy(image_data)
-
-            if image is None:
-                results.append({
-                    'status': 'error',
-                    'file_name': file_name,
-                    'message': 'Failed to decode image'
-                })
-                failed += 1
-                continue
-
-            # Apply preprocessors
-            temp_path = Path(file_name)
-            processed_image = image_ops.apply_preprocessors(temp_path, image, template)
-
-            # Check if preprocessing succeeded
-            if processed_image is None:
-                results.append({
-                    'status': 'error',
-                    'file_name': file_name,
-                    'message': 'Preprocessing failed - markers not found in image'
-                })
-                failed += 1
-                continue
-
-            # Read OMR response
-            omr_response, final_marked, multi_marked, multi_roll = image_ops.read_omr_response(
-                template,
-                processed_image,
-                file_name,
-                save_dir=None
-            )
-
-            # Get concatenated responses
-            concatenated_response = get_concatenated_response(omr_response, template)
+    results = []
+    successful = 0
+    failed = 0
 
-            # Build result
-            result = {
-                'status': 'success',
-                'file_name': file_name,
-                'response': concatenated_response,
-                'raw_response': omr_response,
-                'metadata': {
-                    'multi_marked': bool(multi_marked),
-                    'multi_roll': bool(multi_roll),
-                    'multi_marked_count': int(multi_marked),
-                    'image_dimensions': list(image.shape[:2])
-                }
-            }
+    # Process all images while the next files are read in the background
+    # (straight into numpy buffers that are decoded without copies)
+    for img_file, image_buffer in _iter_file_buffers(image_files):
+        result = _process_with_prepared(
+            image_buffer,
+            img_file.name,
+            config,
+            template,
+            image_ops,
+            include_image=include_images,
+            image_format=image_format,
+            image_delivery=image_delivery,
+            max_decode_scale=max_decode_scale
+        )
 
-            # Add processed image if requested
-            if include_images and final_marked is not None:
-                result['processed_image'] = numpy_to_base64(final_marked)
+        results.append(result)
 
-            results.append(result)
+        if result['status'] == 'success':
             successful += 1
-
-        except Exception as e:
-            results.append({
-                'status': 'error',
-                'file_name': file_name,
-                'message': str(e)
-            })
+        else:
             failed += 1
 
     return {
         'status': 'success',
-        'total': len(images_data),
+        'total': len(image_files),
         'successful': successful,
         'failed': failed,
         'results': results
     }
+
+
+def _iter_file_buffers(paths: List[Path], read_ahead: int = DIR_READ_AHEAD) -> Iterator[Tuple[Path, np.ndarray]]:
+    """
+    Yield (path, buffer) for each file in order, keeping up to read_ahead
+    files being read by a thread pool so disk latency overlaps processing
+
+    Args:
+        paths: Files to read
+        read_ahead: Number of files read ahead of the one being yielded
+
+    Yields:
+        Tuples of the file path and its contents as a uint8 numpy buffer
+    """
+    paths = iter(paths)
+    with ThreadPoolExecutor(max_workers=read_ahead) as reader:
+        pending = deque(
+            (path, reader.submit(np.fromfile, path, dtype=np.uint8))
+            for path in itertools.islice(paths, read_ahead)
+        )
+        while pending:
+            path, future = pending.popleft()
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append((next_path, reader.submit(np.fromfile, next_path, dtype=np.uint8)))
+            yield path, future.result()
@@ -23,7 +23,7 @@ from src.utils.interaction import InteractionUtils
 
 
 class CropOnMarkers(ImagePreprocessor):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, marker_image=None, **kwargs):
         super().__init__(*args, **kwargs)
         config = self.tuning_config
         marker_ops = self.options
@@ -41,7 +41,7 @@ class CropOnMarkers(ImagePreprocessor):
         )
         self.marker_rescale_steps = int(marker_ops.get("marker_rescale_steps", 10))
         self.apply_erode_subtract = marker_ops.get("apply_erode_subtract", True)
-        self.marker = self.load_marker(marker_ops, config)
+        self.marker = self.load_marker(marker_ops, config, marker_image)
 
     def __str__(self):
         return self.marker_path
@@ -188,15 +188,19 @@ class CropOnMarkers(ImagePreprocessor):
         # image_eroded_sub = image_norm - cv2.erode(image_norm, kernel=np.ones((5,5)),iterations=2)
         return image
 
-    def load_marker(self, marker_ops, config):
-        if not os.path.exists(self.marker_path):
-            logger.error(
-                "Marker not found at path provided in template:",
-                self.marker_path,
-            )
-            exit(31)
+    def load_marker(self, marker_ops, config, marker_image=None):
+        # A marker already decoded in memory (grayscale) takes precedence
+        if marker_image is not None:
+            marker = marker_image
+        else:
+            if not os.path.exists(self.marker_path):
+                logger.error(
+                    "Marker not found at path provided in template:",
+                    self.marker_path,
+                )
+                exit(31)
 
-        marker = cv2.imread(self.marker_path, cv2.IMREAD_GRAYSCALE)
+            marker = cv2.imread(self.marker_path, cv2.IMREAD_GRAYSCALE)
 
         if "sheetToMarkerWidthRatio" in marker_ops:
             marker = ImageUtils.resize_util(
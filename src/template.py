@@ -8,7 +8,6 @@
 """
 from copy import deepcopy
 from pathlib import Path
-from deepmerge import always_merger
 
 from src.constants.common import FIELD_TYPES
 from src.core import ImageInstanceOps
@@ -70,15 +69,19 @@ class Template:
     def parse_output_columns(self, output_columns_array):
         self.output_columns = parse_fields(f"Output Columns", output_columns_array)
 
-    def setup_pre_processors(self, pre_processors_object, relative_dir):
+    def setup_pre_processors(self, pre_processors_object, relative_dir, marker_image=None):
         # load image pre_processors
         self.pre_processors = []
         for pre_processor in pre_processors_object:
             ProcessorClass = PROCESSOR_MANAGER.processors[pre_processor["name"]]
+            extra_kwargs = {}
+            if marker_image is not None and pre_processor["name"] == "CropOnMarkers":
+                extra_kwargs["marker_image"] = marker_image
             pre_processor_instance = ProcessorClass(
                 options=pre_processor["options"],
                 relative_dir=relative_dir,
                 image_instance_ops=self.image_instance_ops,
+                **extra_kwargs,
             )
             self.pre_processors.append(pre_processor_instance)
 
@@ -215,7 +218,7 @@ class Template:
         return str(self.path)
 
     @classmethod
-    def from_dict(cls, template_data, tuning_config, relative_dir=None):
+    def from_dict(cls, template_data, tuning_config, relative_dir=None, marker_image=None):
         """
         Create Template instance from dictionary instead of file path
 
@@ -223,6 +226,8 @@ class Template:
             template_data: Dictionary with template configuration
             tuning_config: Configuration object
             relative_dir: Optional base directory for relative paths (defaults to current dir)
+            marker_image: Optional decoded (grayscale) marker image for CropOnMarkers,
+                used instead of reading the marker file
 
         Returns:
             Template instance
@@ -266,7 +271,11 @@ class Template:
         )
 
         instance.parse_output_columns(output_columns_array)
-        instance.setup_pre_processors(pre_processors_object, instance.path.parent if isinstance(instance.path, Path) else Path.cwd())
+        instance.setup_pre_processors(
+            pre_processors_object,
+            instance.path.parent if isinstance(instance.path, Path) else Path.cwd(),
+            marker_image=marker_image,
+        )
         instance.setup_field_blocks(field_blocks_object)
         instance.parse_custom_labels(custom_labels_object)
 
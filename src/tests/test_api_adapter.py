@@ -0,0 +1,98 @@
+import json
+import os
+
+from src.api_adapter import (
+    _iter_file_buffers,
+    _load_template_cached,
+    _prepare_config,
+    process_omr_image,
+)
+from src.defaults import CONFIG_DEFAULTS
+from src.utils.parsing import open_config_with_defaults
+
+
+def test_prepare_config_leaves_defaults_untouched():
+    default_width = CONFIG_DEFAULTS.dimensions.processing_width
+
+    config = _prepare_config({"dimensions": {"processing_width": 999}}, auto_align=True)
+
+    assert config is not CONFIG_DEFAULTS
+    assert config.dimensions.processing_width == 999
+    assert config.alignment_params.auto_align is True
+    assert CONFIG_DEFAULTS.dimensions.processing_width == default_width
+    assert _prepare_config(None, auto_align=False).alignment_params.auto_align is False
+
+
+def test_prepare_config_cached_by_content():
+    assert _prepare_config({"a": {"b": 1, "c": 2}}, False) is _prepare_config(
+        {"a": {"c": 2, "b": 1}}, False
+    )
+    assert _prepare_config(None, False) is not _prepare_config(None, True)
+
+
+def test_prepare_config_without_config_data_matches_empty_merge():
+    config = _prepare_config(None, auto_align=True, disable_display=False)
+
+    assert config == _prepare_config({"outputs": {}}, True, False)
+    assert config.dimensions.processing_width == 1240
+    assert config.threshold_params.MIN_JUMP == 10
+    assert config.alignment_params.auto_align is True
+
+
+def test_iter_file_buffers_keeps_order(tmp_path):
+    paths = []
+    for i in range(7):
+        path = tmp_path / f"{i}.bin"
+        path.write_bytes(bytes([i]) * (i + 1))
+        paths.append(path)
+
+    buffers = list(_iter_file_buffers(paths, read_ahead=3))
+
+    assert [path for path, _ in buffers] == paths
+    assert [buffer.tolist() for _, buffer in buffers] == [[i] * (i + 1) for i in range(7)]
+
+
+def test_load_template_cached_until_modified(tmp_path):
+    template_path = tmp_path / "template.json"
+    template_path.write_text('{"pageDimensions": [1, 2]}')
+    mtime_ns = template_path.stat().st_mtime_ns
+
+    template = _load_template_cached(str(template_path), mtime_ns)
+    assert _load_template_cached(str(template_path), mtime_ns) is template
+
+    template_path.write_text('{"pageDimensions": [3, 4]}')
+    os.utime(template_path, ns=(mtime_ns + 1, mtime_ns + 1))
+    reloaded = _load_template_cached(str(template_path), template_path.stat().st_mtime_ns)
+    assert reloaded["pageDimensions"] == [3, 4]
+
+
+def test_prepared_config_has_attribute_access():
+    config = _prepare_config({"threshold_params": {"MIN_JUMP": 30}}, auto_align=False)
+
+    assert config.threshold_params.MIN_JUMP == 30
+    assert config.threshold_params.get("MIN_GAP") == CONFIG_DEFAULTS.threshold_params.MIN_GAP
+    assert not hasattr(config.outputs, "missing")
+
+
+def test_prepare_config_applies_loaded_config(tmp_path):
+    config_path = tmp_path / "config.json"
+    config_path.write_text(
+        '{"threshold_params": {"MIN_JUMP": 77}, "dimensions": {"processing_width": 999}}'
+    )
+
+    config = _prepare_config(open_config_with_defaults(config_path), auto_align=False)
+
+    assert config.threshold_params.MIN_JUMP == 77
+    assert config.dimensions.processing_width == 999
+
+
+def test_undecodable_marker_reported_as_error():
+    with open("samples/sample1/template.json") as f:
+        template = json.load(f)
+    with open("samples/sample1/MobileCamera/sheet1.jpg", "rb") as f:
+        image_bytes = f.read()
+
+    result = process_omr_image(image_bytes, template, marker_data=b"not an image")
+
+    assert result["status"] == "error"
+    assert result["message"] == "Failed to decode marker image"
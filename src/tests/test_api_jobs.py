@@ -0,0 +1,75 @@
+import json
+import os
+import threading
+import time
+
+from api import jobs
+from api.jobs import get_job, iter_progress_events, submit_job
+
+
+def parse_events(events):
+    return [json.loads(event[len("data: "):]) for event in events if event.startswith("data: ")]
+
+
+def test_job_progress_and_result_read_from_store(mocker, tmp_path):
+    mocker.patch.object(jobs, "JOBS_DIR", str(tmp_path))
+
+    def target(progress_callback, images):
+        for index, name in enumerate(images, start=1):
+            progress_callback(index, len(images), {"file_name": name})
+        return {"status": "success", "total": len(images)}
+
+    job_id = submit_job(target, images=["a.jpg", "b.jpg"])
+    events = parse_events(iter_progress_events(get_job(job_id)))
+
+    assert [event["stage"] for event in events] == ["started", "processing", "processing", "done"]
+    assert events[1]["file_name"] == "a.jpg"
+    assert get_job(job_id) == {
+        "id": job_id,
+        "status": "done",
+        "result": {"status": "success", "total": 2},
+    }
+    # Every listener gets all events
+    assert parse_events(iter_progress_events(get_job(job_id))) == events
+
+
+def test_failed_job_reports_error(mocker, tmp_path):
+    mocker.patch.object(jobs, "JOBS_DIR", str(tmp_path))
+
+    def target(progress_callback):
+        raise ValueError("broken")
+
+    job_id = submit_job(target)
+    events = parse_events(iter_progress_events(get_job(job_id)))
+
+    assert events[-1] == {"stage": "error", "pct": 100, "message": "broken"}
+    assert get_job(job_id)["result"] == {"status": "error", "message": "broken"}
+    assert get_job("0" * 32) is None
+    assert get_job("../etc") is None
+
+
+def test_orphaned_job_failed_after_stall(mocker, tmp_path):
+    mocker.patch.object(jobs, "JOBS_DIR", str(tmp_path))
+    release = threading.Event()
+
+    def target(progress_callback):
+        # Stands in for a job whose worker died, it never finishes
+        release.wait()
+
+    try:
+        job_id = submit_job(target)
+        events_path = tmp_path / job_id / "events.ndjson"
+        while not events_path.read_bytes():
+            time.sleep(0.01)
+        assert get_job(job_id)["status"] == "running"
+
+        # No progress for longer than JOB_STALL_SECONDS
+        stale = events_path.stat().st_mtime - jobs.JOB_STALL_SECONDS - 1
+        os.utime(events_path, (stale, stale))
+
+        events = parse_events(iter_progress_events(get_job(job_id), heartbeat=0))
+        assert events[-1]["stage"] == "error"
+        assert get_job(job_id)["status"] == "error"
+        assert "terminated unexpectedly" in get_job(job_id)["result"]["message"]
+    finally:
+        release.set()
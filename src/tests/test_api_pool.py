@@ -0,0 +1,52 @@
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from api import pool
+from api.pool import get_pool, iter_completed
+from src import api_adapter
+
+
+def square_or_crash(task):
+    if task == "crash":
+        # Simulates a worker killed mid-batch, e.g. by the OOM killer
+        os._exit(1)
+    return task * task
+
+
+@pytest.fixture
+def two_process_pool(mocker):
+    mocker.patch.object(pool, "POOL_WORKERS", 2)
+    mocker.patch.object(pool, "PARALLEL_BATCH_ENABLED", True)
+    mocker.patch.object(pool, "_pool", None)
+    yield
+    if pool._pool is not None:
+        pool._pool.shutdown()
+
+
+def test_pool_replaced_after_worker_dies(two_process_pool):
+    broken_pool = get_pool()
+    with pytest.raises(BrokenProcessPool):
+        list(iter_completed(square_or_crash, [2, "crash", 3]))
+
+    assert get_pool() is not broken_pool
+    assert sorted(iter_completed(square_or_crash, [2, 3])) == [(0, 4), (1, 9)]
+
+
+def test_batch_reports_images_of_dead_worker(mocker):
+    def iter_completed_then_crash(fn, tasks):
+        yield 1, {"status": "success", "file_name": "b.jpg"}
+        raise BrokenProcessPool("worker died")
+
+    mocker.patch.object(api_adapter, "should_parallelize", return_value=True)
+    mocker.patch.object(api_adapter, "iter_completed", iter_completed_then_crash)
+
+    result = api_adapter.process_omr_batch(
+        [b"a", b"b", b"c"], ["a.jpg", "b.jpg", "c.jpg"], {"pageDimensions": [1, 2]}
+    )
+
+    assert result["successful"] == 1
+    assert result["failed"] == 2
+    assert [r["file_name"] for r in result["results"]] == ["a.jpg", "b.jpg", "c.jpg"]
+    assert result["results"][0]["status"] == "error"
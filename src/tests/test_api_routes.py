@@ -0,0 +1,38 @@
+import os
+
+from api import routes
+
+
+def test_default_files_reloaded_when_modified(mocker, tmp_path):
+    mocker.patch.object(routes, "DEFAULTS_DIR", str(tmp_path))
+    template_path = tmp_path / "template.json"
+
+    assert routes._default_template() is None
+
+    template_path.write_bytes(b'{"pageDimensions": [1, 2]}')
+    assert routes._default_template() == (b'{"pageDimensions": [1, 2]}', {"pageDimensions": [1, 2]})
+
+    mtime_ns = template_path.stat().st_mtime_ns
+    template_path.write_bytes(b'{"pageDimensions": [3, 4]}')
+    os.utime(template_path, ns=(mtime_ns + 1, mtime_ns + 1))
+    assert routes._default_template()[1] == {"pageDimensions": [3, 4]}
+
+
+def test_cache_clear_requires_admin_token(mocker, monkeypatch):
+    from flask import Flask
+
+    clear_caches = mocker.patch.object(routes, "clear_caches")
+    app = Flask(__name__)
+    app.register_blueprint(routes.api_blueprint, url_prefix="/api")
+    client = app.test_client()
+
+    monkeypatch.delenv("OMR_API_ADMIN_TOKEN", raising=False)
+    assert client.post("/api/admin/cache/clear").status_code == 404
+
+    monkeypatch.setenv("OMR_API_ADMIN_TOKEN", "secret")
+    assert client.post("/api/admin/cache/clear", headers={"X-Admin-Token": "nope"}).status_code == 403
+    assert not clear_caches.called
+
+    response = client.post("/api/admin/cache/clear", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    clear_caches.assert_called_once()
@@ -0,0 +1,282 @@
+import io
+import json
+import time
+
+import cv2
+import numpy as np
+import pytest
+from dotmap import DotMap
+from flask import Flask, request
+from werkzeug.formparser import MultiPartParser
+
+from api import utils
+from api.utils import (
+    ALLOWED_JSON_EXTENSIONS,
+    OMRRequest,
+    ORJSONProvider,
+    allowed_file,
+    as_decoded_image,
+    bytes_to_numpy,
+    cache_result,
+    create_csv_response,
+    create_json_response,
+    create_ndjson_response,
+    get_cached_result,
+    get_decode_scale,
+    get_image_dimensions,
+    get_jpeg_size,
+    get_preview,
+    has_jpeg_exif,
+    result_cache_key,
+    store_preview,
+    validate_template_json,
+    validate_template_json_cached,
+)
+from src.tests.test_samples.sample2.boilerplate import TEMPLATE_BOILERPLATE
+
+
+def encode_blank(width, height, ext=".jpg"):
+    _, buffer = cv2.imencode(ext, np.full((height, width), 255, dtype=np.uint8))
+    return buffer.tobytes()
+
+
+def test_template_validation_cached_by_content(mocker):
+    mock_validate = mocker.patch(
+        "api.utils.validate_template_json", return_value=True
+    )
+    raw_template = b'{"pageDimensions": [300, 400], "fieldBlocks": {}}'
+    utils._template_validation_cache.clear()
+
+    assert validate_template_json_cached(raw_template, {}) is True
+    assert validate_template_json_cached(raw_template, {}) is True
+    assert mock_validate.call_count == 1
+
+    validate_template_json_cached(raw_template + b" ", {})
+    assert mock_validate.call_count == 2
+
+
+def test_template_validation_cache_evicts_oldest(mocker):
+    mocker.patch("api.utils.validate_template_json", return_value=True)
+    mocker.patch.object(utils, "VALIDATION_CACHE_SIZE", 2)
+    utils._template_validation_cache.clear()
+
+    for raw_template in [b"1", b"2", b"3"]:
+        validate_template_json_cached(raw_template, {})
+
+    assert len(utils._template_validation_cache) == 2
+
+
+def test_allowed_file_matches_suffix():
+    assert allowed_file("sheet.JPG")
+    assert allowed_file("scan.v2.jpeg")
+    assert not allowed_file("template.json")
+    assert not allowed_file("jpg")
+
+
+def test_allowed_file_accepts_any_iterable_of_extensions():
+    assert allowed_file("template.json", ALLOWED_JSON_EXTENSIONS)
+    assert allowed_file("template.JSON", ("json",))
+    assert allowed_file("scan.tif", ["tiff", "tif"])
+    assert not allowed_file("sheet.jpg", ALLOWED_JSON_EXTENSIONS)
+
+
+def test_result_cache_key_depends_on_all_inputs():
+    key = result_cache_key(b"image", {"a": 1, "b": 2}, {"c": 3}, b"marker")
+
+    assert key == result_cache_key(b"image", {"b": 2, "a": 1}, {"c": 3}, b"marker")
+    assert key != result_cache_key(b"image", {"a": 1, "b": 2}, {"c": 3}, None)
+    assert key != result_cache_key(b"image", {"a": 1, "b": 2}, {"c": 3}, b"marker", True)
+    assert result_cache_key(b"ab", {}, None, b"c") != result_cache_key(b"a", {}, None, b"bc")
+
+
+def test_result_cache_key_depends_on_dotmap_config():
+    template = {"pageDimensions": [1, 2]}
+    config = DotMap({"threshold_params": {"MIN_JUMP": 77}}, _dynamic=False)
+
+    assert result_cache_key(b"img", template, config) != result_cache_key(b"img", template)
+    assert result_cache_key(b"img", template, config) == result_cache_key(
+        b"img", template, config.toDict()
+    )
+
+
+def test_cached_result_is_copied(mocker):
+    mocker.patch.object(utils, "_result_cache", utils.OrderedDict())
+    result = {"status": "success", "response": {"q1": "A"}}
+
+    assert get_cached_result("key") is None
+    cache_result("key", result)
+    result["response"]["q1"] = "B"
+    get_cached_result("key")["response"]["q1"] = "C"
+
+    assert get_cached_result("key") == {"status": "success", "response": {"q1": "A"}}
+
+
+def test_orjson_provider_serializes_numpy():
+    app = Flask(__name__)
+    app.json = ORJSONProvider(app)
+
+    data = app.json.dumps({"dims": np.array([3, 4]), "count": np.int64(2), 1: "a"})
+
+    assert app.json.loads(data) == {"dims": [3, 4], "count": 2, "1": "a"}
+
+
+def test_json_response_serializes_numpy():
+    response = create_json_response({"dims": np.array([3, 4]), "multi": np.bool_(False)})
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/json"
+    assert response.get_json() == {"dims": [3, 4], "multi": False}
+
+
+def test_uploads_spooled_to_disk_above_configured_size():
+    app = Flask(__name__)
+    app.request_class = OMRRequest
+    app.config["UPLOAD_SPOOL_SIZE"] = 1000
+
+    @app.post("/upload")
+    def upload():
+        stream = request.files["image"].stream
+        return {"rolled": stream._rolled, "size": len(stream.read())}
+
+    client = app.test_client()
+    for size, rolled in [(500, False), (5000, True)]:
+        response = client.post(
+            "/upload",
+            data={"image": (io.BytesIO(b"x" * size), "sheet.jpg")},
+            content_type="multipart/form-data",
+        )
+        assert response.get_json() == {"rolled": rolled, "size": size}
+
+
+def test_uploads_parsed_with_large_buffer(mocker):
+    # Guards the _parse_multipart override against Werkzeug changes
+    parse_spy = mocker.spy(MultiPartParser, "parse")
+    app = Flask(__name__)
+    app.request_class = OMRRequest
+
+    @app.post("/upload")
+    def upload():
+        return {"size": len(request.files["image"].read())}
+
+    response = app.test_client().post(
+        "/upload",
+        data={"image": (io.BytesIO(b"x" * 5000), "sheet.jpg")},
+        content_type="multipart/form-data",
+    )
+
+    assert response.get_json() == {"size": 5000}
+    parser = parse_spy.call_args.args[0]
+    assert parser.buffer_size == utils.UPLOAD_BUFFER_SIZE == 256 * 1024
+
+
+def test_jpeg_size_read_from_header():
+    assert get_jpeg_size(encode_blank(640, 480)) == (640, 480)
+    assert get_jpeg_size(encode_blank(640, 480, ".png")) is None
+    assert get_jpeg_size(np.frombuffer(encode_blank(640, 480), np.uint8)) == (640, 480)
+
+
+def test_jpeg_exif_detected_from_header():
+    image_bytes = encode_blank(64, 48)
+    exif_segment = b"\xff\xe1\x00\x10Exif\x00\x00" + bytes(8)
+    exif_bytes = image_bytes[:2] + exif_segment + image_bytes[2:]
+
+    assert not has_jpeg_exif(image_bytes)
+    assert has_jpeg_exif(exif_bytes)
+    assert get_jpeg_size(exif_bytes) == (64, 48)
+    assert not has_jpeg_exif(encode_blank(64, 48, ".png"))
+
+
+def test_oversized_jpeg_decoded_at_reduced_scale():
+    image_bytes = encode_blank(3000, 4000)
+
+    assert get_decode_scale(image_bytes, 2000, 2000) == 1
+    assert get_decode_scale(image_bytes, 1240, 1754) == 2
+    assert get_decode_scale(image_bytes, 666, 820) == 4
+    assert get_decode_scale(image_bytes, 300, 400) == 8
+    assert get_decode_scale(image_bytes) == 1
+    assert get_decode_scale(image_bytes, 300, 400, max_scale=2) == 2
+    assert get_decode_scale(image_bytes, 300, 400, max_scale=1) == 1
+
+    image = bytes_to_numpy(image_bytes, 1240, 1754)
+    assert image.shape == (2000, 1500)
+    assert get_image_dimensions(image_bytes, image) == [4000, 3000]
+
+    # Landscape scan resized to a portrait template: the height is the limit
+    landscape_bytes = encode_blank(4000, 3000)
+    assert get_decode_scale(landscape_bytes, 1240, 1754) == 1
+    assert get_decode_scale(landscape_bytes, 666, 820) == 2
+    assert get_decode_scale(landscape_bytes, 1754, 1240) == 2
+
+    # EXIF orientation may swap the axes, so both sides must cover the target
+    exif_segment = b"\xff\xe1\x00\x10Exif\x00\x00" + bytes(8)
+    exif_bytes = image_bytes[:2] + exif_segment + image_bytes[2:]
+    assert get_decode_scale(exif_bytes, 1240, 1754) == 1
+    assert get_decode_scale(exif_bytes, 666, 820) == 2
+
+
+def test_decoded_images_passed_through_as_grayscale():
+    gray = np.full((30, 40), 200, dtype=np.uint8)
+    bgr = np.zeros((30, 40, 3), dtype=np.uint8)
+
+    assert as_decoded_image(gray) is gray
+    assert as_decoded_image(bgr).shape == (30, 40)
+    assert as_decoded_image(encode_blank(40, 30)) is None
+    assert as_decoded_image(np.frombuffer(encode_blank(40, 30), np.uint8)) is None
+    with pytest.raises(ValueError):
+        as_decoded_image(gray.astype(np.float32))
+
+
+def test_preview_stored_and_served_by_token(mocker, tmp_path):
+    mocker.patch.object(utils, "PREVIEW_DIR", str(tmp_path))
+
+    url = store_preview(np.zeros((20, 10), dtype=np.uint8), "png")
+    token = url.rsplit("/", 1)[-1]
+    file_path, mimetype = get_preview(token)
+
+    assert url.startswith("/api/omr/image/")
+    assert mimetype == "image/png"
+    assert cv2.imread(file_path, cv2.IMREAD_GRAYSCALE).shape == (20, 10)
+    assert get_preview("../" + token) is None
+    assert get_preview("0" * 32) is None
+
+
+def test_csv_response_has_union_of_columns():
+    response = create_csv_response(
+        {
+            "results": [
+                {"status": "success", "file_name": "a.jpg"},
+                {"status": "error", "file_name": "b.jpg", "message": "Failed"},
+            ]
+        }
+    )
+
+    assert response.mimetype == "text/csv"
+    assert response.get_data(as_text=True) == (
+        "status,file_name,message\n" "success,a.jpg,\n" "error,b.jpg,Failed\n"
+    )
+
+
+def test_ndjson_response_streams_results_then_summary():
+    results = [
+        {"status": "success", "file_name": "a.jpg"},
+        {"status": "error", "file_name": "b.jpg", "message": "Failed"},
+    ]
+
+    with Flask(__name__).test_request_context():
+        response = create_ndjson_response(iter(results), time.time())
+        lines = [json.loads(line) for line in response.response]
+
+    assert response.mimetype == "application/x-ndjson"
+    assert lines[:2] == results
+    assert lines[2]["total"] == 2
+    assert (lines[2]["successful"], lines[2]["failed"]) == (1, 1)
+
+
+def test_template_validation_reports_schema_errors():
+    assert validate_template_json(TEMPLATE_BOILERPLATE) is True
+
+    template = {"pageDimensions": [300, 400], "fieldBlocks": {}}
+    result = validate_template_json(template, return_details=True)
+
+    assert result["valid"] is False
+    assert result["errors"] == ["$root: 'bubbleDimensions' is a required property"]
@@ -15,4 +15,8 @@ echo "Press Ctrl+C to stop the server"
 echo ""
 
 cd "$(dirname "$0")"
-python3 -m api.app
+if [ -n "$FLASK_DEV" ]; then
+    python3 -m api.app
+else
+    gunicorn -c gunicorn.conf.py api.wsgi:application
+fi